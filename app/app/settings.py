@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    # Only kept for the migration of its tokens to core.AuthToken
     'rest_framework.authtoken',
     'core',
     'user',
@@ -46,7 +47,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Only active with PROFILING=1, see core.profiling
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -81,16 +85,113 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # DB_POOL=1 switches to the stock backend plus a per-process
+        # connection pool, see core.db.backends.postgresql
+        'ENGINE': (
+            'core.db.backends.postgresql'
+            if os.environ.get('DB_POOL') == '1'
+            else 'django.db.backends.postgresql'
+        ),
         # Gets access to the environment variable defined in docker-compose file
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds a connection is kept open after a request, 0 closes it
+        # after every request (or hands it back to the pool)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            # Seconds before a connection is replaced by a fresh one
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+            # Seconds an idle connection above MIN_SIZE is kept open
+            'MAX_IDLE': int(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            # Seconds to wait for a free connection
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Connections idle for longer are checked with SELECT 1 first
+            'HEALTH_CHECK_AFTER': int(
+                os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30)),
+        },
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Sessions (the admin) are kept in the database; with a cache shared by
+# every worker as SESSION_CACHE_ALIAS, SESSION_ENGINE=core.sessions reads
+# them from the cache and writes them through to the database
+# Expired sessions are deleted by the purge_sessions command
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = os.environ.get('SESSION_CACHE_ALIAS', 'default')
+# Seconds a session stays in the cache of core.sessions
+SESSION_CACHE_TTL = int(os.environ.get('SESSION_CACHE_TTL', 300))
+
+
+# Authentication backends
+# https://docs.djangoproject.com/en/3.2/topics/auth/customizing/
+
+# Same as ModelBackend, with password checks running on the hashing pool
+AUTHENTICATION_BACKENDS = ['core.backends.PooledModelBackend']
+
+# Process pool used for password hashing, see core.hashing
+PASSWORD_HASHING_POOL = {
+    'ENABLED': os.environ.get('PASSWORD_HASHING_POOL', '1') == '1',
+    # Defaults to the number of CPUs
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 0)) or None,
+    # Jobs queued or running before requests get a 503, defaults to
+    # four per worker
+    'MAX_PENDING': int(os.environ.get('PASSWORD_HASHING_MAX_PENDING', 0))
+    or None,
+    # Seconds to wait for a single hash
+    'TIMEOUT': int(os.environ.get('PASSWORD_HASHING_TIMEOUT', 30)),
+}
+
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2
+# Each host becomes a replica_<n> database with the credentials of default
+# and safe reads are routed to them by core.db.routers.ReplicaRouter
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get(
+        'DB_REPLICA_HOSTS', '').split(','))):
+    alias = 'replica_%d' % index
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host.strip(),
+        # A replica that is down must fail fast: reads then fall back to
+        # the primary
+        OPTIONS=dict(
+            DATABASES['default'].get('OPTIONS', {}),
+            connect_timeout=int(
+                os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 2)),
+            # Milliseconds, 0 disables it
+            options='-c statement_timeout=%d' % int(
+                os.environ.get('DB_REPLICA_STATEMENT_TIMEOUT', 30000)),
+        ),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = (
+    ['core.db.routers.ReplicaRouter'] if DATABASE_REPLICAS else [])
+# Replicas lagging further behind (in seconds) are skipped
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+# Seconds between two health/lag checks of a replica
+REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+# Seconds a client keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -134,6 +235,121 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
+# The browsable API renders HTML templates for browser requests, only worth
+# it while developing
+API_BROWSABLE = os.environ.get('API_BROWSABLE', '1' if DEBUG else '0') == '1'
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-}
\ No newline at end of file
+    # JSON through orjson when it is installed, see core.renderers
+    'DEFAULT_RENDERER_CLASSES': ['core.renderers.FastJSONRenderer'] + (
+        ['rest_framework.renderers.BrowsableAPIRenderer']
+        if API_BROWSABLE else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS':
+        'core.negotiation.FastContentNegotiation',
+    'EXCEPTION_HANDLER': 'user.exceptions.exception_handler',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'user.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # Proxies in front of the app whose X-Forwarded-For is trusted by the
+    # throttles (e.g. the IP limit of user.throttling); with 0 the client
+    # is REMOTE_ADDR, a header sent by the client itself is ignored
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# OpenAPI schema written by "manage.py generate_schema" at build time, loaded
+# by /api/schema/ instead of generating it in every worker, see core.schema
+API_SCHEMA_FILE = os.environ.get('API_SCHEMA_FILE', '')
+
+# API tokens, see core.models.AuthToken
+AUTH_TOKEN = {
+    # Seconds a token is valid for
+    'TTL': int(os.environ.get('AUTH_TOKEN_TTL', 30 * 24 * 3600)),
+    # Logging in with a token older than this (in seconds) issues a new one
+    'ROTATE_AFTER': int(os.environ.get(
+        'AUTH_TOKEN_ROTATE_AFTER', 7 * 24 * 3600)),
+    # Seconds a rotated token keeps working
+    'ROTATION_GRACE': int(os.environ.get('AUTH_TOKEN_ROTATION_GRACE', 60)),
+    # Seconds between two batched writes of last_used_at, see core.tokens
+    'LAST_USED_INTERVAL': int(os.environ.get(
+        'AUTH_TOKEN_LAST_USED_INTERVAL', 60)),
+}
+
+# Deferred activity timestamps, see core.activity
+USER_ACTIVITY = {
+    # Seconds between two batched writes of last_login, i.e. how stale the
+    # column may be
+    'LAST_LOGIN_INTERVAL': int(os.environ.get('USER_LAST_LOGIN_INTERVAL', 60)),
+    # Pending logins per process that trigger an early flush
+    'MAX_PENDING': int(os.environ.get('USER_LAST_LOGIN_MAX_PENDING', 10000)),
+}
+
+# Rendered bodies of /api/user/currentuser/, see user.profile_cache
+USER_PROFILE_CACHE = {
+    # Alias from CACHES, disabled when empty (ETags are sent either way)
+    'ALIAS': os.environ.get('USER_PROFILE_CACHE', ''),
+    'TTL': int(os.environ.get('USER_PROFILE_CACHE_TTL', 300)),
+}
+
+# Cache in front of the token lookup done by
+# user.authentication.CachedTokenAuthentication
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_ENTRIES', 10000)),
+    # Seconds a token stays in the per-process cache, i.e. how long other
+    # workers may still accept a revoked token without a shared tier
+    'LOCAL_TTL': int(os.environ.get('TOKEN_AUTH_CACHE_LOCAL_TTL', 30)),
+    # Alias from CACHES shared by every worker, used instead of the
+    # per-process cache so that invalidations reach all of them; per-process
+    # cache when empty
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_CACHE_SHARED', ''),
+    'SHARED_TTL': int(os.environ.get('TOKEN_AUTH_CACHE_SHARED_TTL', 300)),
+}
+
+# Permissions of each user cached across requests by
+# core.backends.PooledModelBackend, see core.permission_cache
+PERMISSION_CACHE = {
+    # Alias from CACHES, disabled when empty; set it to a cache shared by
+    # every worker (e.g. redis or memcached), invalidations do not reach the
+    # other workers' per-process caches
+    'ALIAS': os.environ.get('PERMISSION_CACHE', ''),
+    # Seconds an entry is kept, i.e. how long a worker with its own cache
+    # may still see permissions changed elsewhere
+    'TTL': int(os.environ.get('PERMISSION_CACHE_TTL', 60)),
+}
+
+# Sliding window limits on /api/user/token/, see user.throttling
+LOGIN_THROTTLE = {
+    'ENABLED': os.environ.get('LOGIN_THROTTLE', '1') == '1',
+    # Alias from CACHES shared by every worker, per-process counters if empty
+    'STORE': os.environ.get('LOGIN_THROTTLE_STORE', ''),
+    # Keys kept by the per-process store
+    'MAX_ENTRIES': int(os.environ.get('LOGIN_THROTTLE_MAX_ENTRIES', 100000)),
+    'WINDOW': int(os.environ.get('LOGIN_THROTTLE_WINDOW', 300)),
+    # Attempts per window for one email, and for one client IP
+    'EMAIL_LIMIT': int(os.environ.get('LOGIN_THROTTLE_EMAIL_LIMIT', 10)),
+    'IP_LIMIT': int(os.environ.get('LOGIN_THROTTLE_IP_LIMIT', 100)),
+}
+
+# Serve the create, token and currentuser endpoints with the coroutine views
+# from user.async_views, only worth it under an ASGI server (app.asgi)
+USER_API_ASYNC = os.environ.get('USER_API_ASYNC', '0') == '1'
+
+# Rows per INSERT statement for UserManager.bulk_create_users
+USER_BULK_CREATE_BATCH_SIZE = int(
+    os.environ.get('USER_BULK_CREATE_BATCH_SIZE', 1000))
+# Largest payload accepted by /api/user/bulk-create/
+USER_BULK_CREATE_MAX_ROWS = int(
+    os.environ.get('USER_BULK_CREATE_MAX_ROWS', 10000))
+
+# Per request timing and query counting, exposed on /api/metrics/
+PROFILING_ENABLED = os.environ.get('PROFILING', '0') == '1'
+# Requests running the same query this many times are reported as N+1
+PROFILING_N_PLUS_ONE_THRESHOLD = int(
+    os.environ.get('PROFILING_N_PLUS_ONE_THRESHOLD', 10))
@@ -0,0 +1,15 @@
+# Settings for API-only nodes, DJANGO_SETTINGS_MODULE=app.settings_api: the
+# production settings with less to load when a worker starts (see the
+# startup_report command)
+# The admin and the docs stay available, they are loaded when first used (see
+# app/urls.py and core/lazy_urls.py)
+from app.settings_production import *  # noqa: F401,F403
+from app.settings_production import INSTALLED_APPS
+
+# The admin without the autodiscovery of every admin module at startup,
+# app/urls_admin.py runs it instead
+INSTALLED_APPS = [
+    'django.contrib.admin.apps.SimpleAdminConfig'
+    if app == 'django.contrib.admin' else app
+    for app in INSTALLED_APPS
+]
@@ -0,0 +1,67 @@
+# Settings for production, DJANGO_SETTINGS_MODULE=app.settings_production
+# (the default of gunicorn.conf.py): app.settings with DEBUG off, and the
+# deployment specific values read from the environment
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import DATABASES, MIDDLEWARE, REST_FRAMEWORK
+
+# Also stops every SQL query from being kept in connection.queries
+DEBUG = False
+
+SECRET_KEY = os.environ.get('SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured(
+        'The SECRET_KEY environment variable is required.')
+
+# Comma separated host names
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
+
+# Keep database connections across requests, except with the connection
+# pool (DB_POOL=1) which gets them back after each request
+for database in DATABASES.values():
+    if database['ENGINE'] != 'core.db.backends.postgresql':
+        database['CONN_MAX_AGE'] = int(
+            os.environ.get('DB_CONN_MAX_AGE', 60))
+
+# JSON only, unless API_BROWSABLE=1
+API_BROWSABLE = os.environ.get('API_BROWSABLE', '0') == '1'
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_RENDERER_CLASSES=['core.renderers.FastJSONRenderer'] + (
+        ['rest_framework.renderers.BrowsableAPIRenderer']
+        if API_BROWSABLE else []),
+)
+
+# Behind a proxy terminating TLS (SECURE_PROXY=1)
+if os.environ.get('SECURE_PROXY') == '1':
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = CSRF_COOKIE_SECURE = (
+    os.environ.get('SECURE_COOKIES', '1') == '1')
+
+# Collected when the image is built (see the Dockerfile) and served by the
+# application itself with whitenoise, compressed and cached for good under
+# their hashed names
+STATIC_ROOT = os.environ.get('STATIC_ROOT', '/app/static')
+STATICFILES_STORAGE = (
+    'whitenoise.storage.CompressedManifestStaticFilesStorage')
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+    'whitenoise.middleware.WhiteNoiseMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'root': {
+        'handlers': ['console'],
+        'level': os.environ.get('LOG_LEVEL', 'INFO'),
+    },
+}
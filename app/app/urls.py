@@ -13,20 +13,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
-from django.contrib import admin
 from django.urls import include, path
 
+from core.lazy_urls import LazyView, lazy_include
+from core.views import MetricsView
+
+# The admin and the API docs are only imported when used, see core.lazy_urls
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    lazy_include('admin/', 'app.urls_admin', 'admin'),
     path('api/user/', include('user.urls')),
-    path('api/schema/', SpectacularAPIView.as_view(), name = 'api-schema'),
+    path('api/metrics/', MetricsView.as_view(), name = 'api-metrics'),
+    path(
+        'api/schema/',
+        LazyView('core.schema_views.CachedSchemaView'),
+        name = 'api-schema',
+    ),
     path(
         'api/docs/',
-        SpectacularSwaggerView.as_view(url_name = 'api-schema'),
+        LazyView(
+            'drf_spectacular.views.SpectacularSwaggerView',
+            url_name = 'api-schema',
+        ),
         name = 'api-docs',
     )
 ]
@@ -0,0 +1,8 @@
+# Admin site, loaded on its first request (see app/urls.py)
+from django.contrib import admin
+
+# Registers the ModelAdmins when settings use SimpleAdminConfig (see
+# app/settings_api.py), does nothing new otherwise
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from core.buffers import WriteBuffer
+
+# Rows per UPDATE statement
+BATCH_SIZE = 1000
+
+# Never moves last_login backwards, e.g. when another process flushed a more
+# recent login first
+UPDATE_LAST_LOGIN_SQL = '''
+    UPDATE {table} AS u SET {column} = v.last_login
+    FROM (VALUES {values}) AS v (id, last_login)
+    WHERE u.{pk} = v.id
+    AND (u.{column} IS NULL OR u.{column} < v.last_login)
+'''
+
+
+def _write_last_login(pending):
+    # pending maps user ids to the time they last logged in
+    User = get_user_model()
+    using = router.db_for_write(User)
+    rows = sorted(pending.items())
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        if connections[using].vendor == 'postgresql':
+            _update_from_values(User, using, batch)
+        else:
+            User.objects.using(using).filter(
+                pk__in=[user_id for user_id, _ in batch]
+            ).update(last_login=Case(*[
+                When(pk=user_id, then=Value(last_login))
+                for user_id, last_login in batch
+            ]))
+
+
+def _update_from_values(User, using, batch):
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    field = User._meta.get_field('last_login')
+    sql = UPDATE_LAST_LOGIN_SQL.format(
+        table=quote_name(User._meta.db_table),
+        column=quote_name(field.column),
+        pk=quote_name(User._meta.pk.column),
+        values=', '.join(['(%s, %s::timestamptz)'] * len(batch)),
+    )
+    params = []
+    for user_id, last_login in batch:
+        params.extend([
+            user_id, field.get_db_prep_value(last_login, connection)])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+last_login = WriteBuffer(
+    'user last_login', _write_last_login,
+    interval=settings.USER_ACTIVITY['LAST_LOGIN_INTERVAL'],
+    max_size=settings.USER_ACTIVITY['MAX_PENDING'])
+
+
+def record_login(user, now=None):
+    # Replaces the UPDATE that django.contrib.auth.models.update_last_login
+    # runs on every login, the row is written by the next flush of the buffer
+    user.last_login = now or timezone.now()
+    last_login.add(user.pk, user.last_login)
+
+
+def record_login_signal(sender, user, **kwargs):
+    # user_logged_in receiver, see CoreConfig.ready
+    record_login(user)
+
+
+def pending_last_login(user_id):
+    # Login of this user not written to the database yet, if any (only
+    # logins handled by the current process are known)
+    return last_login.get(user_id)
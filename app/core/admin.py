@@ -1,16 +1,79 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
 
 # Changing some of the variable of the imported class
 from django.contrib.auth.admin import UserAdmin as BaseUA
+from django.utils import timezone
+from django.utils.formats import date_format
 # Converting strings in python to human-readable content
-from django.utils.translation import gettext
-from core import models
+from django.utils.translation import gettext, ngettext
+from core import activity, models
+from core.paginators import EstimatedCountPaginator
+from user import throttling
+
+
+AFTER_VAR = 'after_id'
+
+
+class KeysetChangeList(ChangeList):
+    # Changelist paged with ?after_id=<last id of the previous page> instead
+    # of ?p=<page number>, so that every page is an index range scan on the
+    # primary key rather than an OFFSET that reads and skips all the rows of
+    # the previous pages
+    # Only used with the default id ordering, sorting by another column
+    # falls back to numbered pages
+
+    def __init__(self, request, *args, **kwargs):
+        self.after_id = None
+        self.next_after_id = None
+        self.keyset = ORDER_VAR not in request.GET
+        if self.keyset:
+            try:
+                self.after_id = int(request.GET.get(AFTER_VAR, ''))
+            except ValueError:
+                pass
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.after_id is not None:
+            queryset = queryset.filter(pk__gt=self.after_id)
+        return queryset
+
+    def get_results(self, request):
+        if self.keyset:
+            self.page_num = 1
+        super().get_results(request)
+        if (self.keyset and not self.show_all
+                and len(self.result_list) >= self.list_per_page):
+            self.next_after_id = self.result_list[self.list_per_page - 1].pk
+        # Links of admin/core/user/pagination.html
+        self.first_page_url = self.get_query_string(remove=[AFTER_VAR])
+        self.next_page_url = None
+        if self.next_after_id is not None:
+            self.next_page_url = self.get_query_string(
+                {AFTER_VAR: self.next_after_id})
 
 
 class UserAdmin(BaseUA):
 
     ordering = ['id']
     list_display = ['email', 'name']
+    # Prefix only, "contains" searches cannot use an index
+    # Emails are stored lowercased, so the (lowercased) term is matched by
+    # the varchar_pattern_ops index Django adds next to the unique one, and
+    # names by the UPPER(name) index of migrations/0004_user_search_indexes
+    search_fields = ['email__startswith', '^name']
+    paginator = EstimatedCountPaginator
+    # No COUNT(*) over the whole user table on every changelist page
+    show_full_result_count = False
+    readonly_fields = ['pending_last_login', 'login_lockout']
+    actions = ['reset_login_lockout']
     # To group fields into different sections
     """
     e.g. for 1 fieldset:
@@ -33,7 +96,11 @@ class UserAdmin(BaseUA):
                 )
             }
         ),
-        (gettext('Important Dates'), {'fields': ('last_login', )})
+        (
+            gettext('Important Dates'),
+            {'fields': ('last_login', 'pending_last_login')}
+        ),
+        (gettext('Login Throttling'), {'fields': ('login_lockout', )})
     )
 
     add_fieldsets = (
@@ -43,5 +110,69 @@ class UserAdmin(BaseUA):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Clients polling the profile see the edit straight away
+            obj.bump_profile_version()
+        super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        return super().get_search_results(
+            request, queryset, search_term.lower())
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    @admin.display(description=gettext('Last login (not saved yet)'))
+    def pending_last_login(self, obj):
+        # last_login is written in batches by core.activity, at most
+        # USER_ACTIVITY['LAST_LOGIN_INTERVAL'] seconds late
+        pending = activity.pending_last_login(obj.pk)
+        if pending is None:
+            return gettext('Nothing pending in this process')
+        return date_format(
+            timezone.localtime(pending), 'DATETIME_FORMAT')
+
+    @admin.display(description=gettext('Token endpoint lockout'))
+    def login_lockout(self, obj):
+        # State of user.throttling.LoginRateThrottle for this email, as
+        # seen from this process when the throttle store is not shared
+        state = throttling.lockout(obj.email)
+        if state is None:
+            return gettext('Not locked out')
+        attempts, wait = state
+        return gettext(
+            'Locked out for %(seconds)d s (%(attempts)d attempts)') % {
+                'seconds': wait, 'attempts': attempts}
+
+    @admin.action(description=gettext('Reset the token endpoint lockout'))
+    def reset_login_lockout(self, request, queryset):
+        count = 0
+        for email in queryset.values_list('email', flat=True):
+            throttling.reset(email)
+            count += 1
+        self.message_user(request, ngettext(
+            'Reset the lockout of %d user.',
+            'Reset the lockout of %d users.', count) % count)
+
 
 admin.site.register(models.User, UserAdmin)
+
+
+class AuthTokenAdmin(admin.ModelAdmin):
+
+    list_display = ['user', 'created_at', 'expires_at', 'last_used_at']
+    raw_id_fields = ['user']
+    readonly_fields = ['created_at', 'last_used_at']
+    exclude = ['raw_key']
+    ordering = ['-id']
+    # No COUNT(*) over the whole token table on every changelist page
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def has_add_permission(self, request):
+        # Keys are generated by AuthToken.objects.issue()
+        return False
+
+
+admin.site.register(models.AuthToken, AuthTokenAdmin)
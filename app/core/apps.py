@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Write the batched updates of core.buffers after requests
+        from django.contrib.auth.models import update_last_login
+        from django.contrib.auth.signals import user_logged_in
+        from django.core.signals import request_finished
+        from core import activity, buffers, tokens  # noqa: F401
+        # Connect the invalidation of the permission cache
+        from core import permission_cache  # noqa: F401
+        request_finished.connect(buffers.flush_due)
+        # Session logins (e.g. the admin) go through the buffer too instead
+        # of saving the user straight away
+        user_logged_in.disconnect(
+            update_last_login, dispatch_uid='update_last_login')
+        user_logged_in.connect(
+            activity.record_login_signal, dispatch_uid='update_last_login')
@@ -0,0 +1,59 @@
+import itertools
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler as DjangoASGIHandler
+
+# Parts of a streaming response read per trip to the sync thread
+STREAMING_BATCH = 256
+
+
+class ASGIHandler(DjangoASGIHandler):
+    # Django 3.2 iterates streaming responses in the event loop, so a
+    # generator reading the database (e.g. core.export) raises
+    # SynchronousOnlyOperation there
+    # The parts are read here on the thread the sync views run on, where the
+    # generator's queries and server-side cursor live, a batch at a time
+    # rather than one trip per row, and sent as one body message per batch
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        parts = iter(response)
+        read = sync_to_async(
+            lambda: list(itertools.islice(parts, STREAMING_BATCH)),
+            thread_sensitive=True)
+        while True:
+            batch = await read()
+            if not batch:
+                break
+            for chunk, _ in self.chunk_bytes(b''.join(batch)):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    # django.core.asgi.get_asgi_application() with the handler above
+    django.setup(set_prefix=False)
+    return ASGIHandler()
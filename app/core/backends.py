@@ -0,0 +1,103 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import (
+    _clean_credentials, _get_backends, get_user_model, user_login_failed)
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+from core import hashing, permission_cache
+
+
+class PooledModelBackend(ModelBackend):
+    # ModelBackend that verifies passwords on the hashing pool
+    # from core.hashing instead of on the request thread, and reads the
+    # permissions of users from core.permission_cache
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Run the hasher once anyway to reduce the timing difference
+            # between existing and non-existing users
+            hashing.make_password(password)
+        else:
+            if (hashing.check_password(user, password)
+                    and self.user_can_authenticate(user)):
+                return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None,
+                            **kwargs):
+        # Coroutine version of authenticate() used by the async views
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await sync_to_async(
+                UserModel._default_manager.get_by_natural_key)(username)
+        except UserModel.DoesNotExist:
+            await hashing.amake_password(password)
+        else:
+            if (await hashing.acheck_password(user, password)
+                    and self.user_can_authenticate(user)):
+                return user
+        return None
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        # ModelBackend keeps both sets on the user instance, fill them from
+        # the cache and only query them (both) on a miss
+        if (not user_obj.is_active or user_obj.is_anonymous
+                or obj is not None
+                or hasattr(user_obj, '_%s_perm_cache' % from_name)):
+            return super()._get_permissions(user_obj, obj, from_name)
+        entry = permission_cache.get(user_obj.pk)
+        if entry is None:
+            entry = (
+                super()._get_permissions(user_obj, obj, 'user'),
+                super()._get_permissions(user_obj, obj, 'group'),
+            )
+            permission_cache.store(user_obj.pk, *entry)
+        # Copies, callers may change the sets they get
+        user_obj._user_perm_cache = set(entry[0])
+        user_obj._group_perm_cache = set(entry[1])
+        return getattr(user_obj, '_%s_perm_cache' % from_name)
+
+
+async def aauthenticate(request=None, **credentials):
+    # Coroutine version of django.contrib.auth.authenticate
+    # Backends without an aauthenticate() method run in a thread
+    for backend, backend_path in _get_backends(return_tuples=True):
+        backend_authenticate = getattr(backend, 'aauthenticate', None)
+        if backend_authenticate is None:
+            backend_authenticate = sync_to_async(backend.authenticate)
+            signature = inspect.signature(backend.authenticate)
+        else:
+            signature = inspect.signature(backend_authenticate)
+        try:
+            signature.bind(request, **credentials)
+        except TypeError:
+            # This backend doesn't accept these credentials as arguments
+            continue
+        try:
+            user = await backend_authenticate(request, **credentials)
+        except PermissionDenied:
+            # This backend says to stop in our tracks - this user should
+            # not be allowed in at all
+            break
+        if user is None:
+            continue
+        user.backend = backend_path
+        return user
+
+    await sync_to_async(user_login_failed.send)(
+        sender=__name__, credentials=_clean_credentials(credentials),
+        request=request)
+    return None
@@ -0,0 +1,78 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_buffers = []
+
+
+class WriteBuffer:
+    # Collects the latest value to write per key (e.g. per row) in this
+    # process and hands them to write() in one batch, at most every
+    # `interval` seconds or once `max_size` keys are pending, instead of
+    # running one UPDATE per request
+    # Flushed after requests by flush_due() (see CoreConfig.ready), servers
+    # should call flush_all() when a worker stops; values still pending when
+    # a process dies are lost, so only use it for data that may lag or be
+    # dropped
+
+    def __init__(self, name, write, interval=60, max_size=10000):
+        self.name = name
+        self.write = write
+        self.interval = interval
+        self.max_size = max_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        _buffers.append(self)
+
+    def add(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+
+    def get(self, key, default=None):
+        # Value waiting to be written for key
+        with self._lock:
+            return self._pending.get(key, default)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def due(self):
+        return bool(self._pending) and (
+            len(self._pending) >= self.max_size
+            or time.monotonic() - self._last_flush >= self.interval)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            self.write(pending)
+        except Exception:
+            # Keep the values for the next flush, unless newer ones came in
+            logger.exception('Could not flush the %s buffer', self.name)
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            return 0
+        return len(pending)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+
+
+def flush_due(**kwargs):
+    # request_finished receiver
+    for buffer in _buffers:
+        if buffer.due():
+            buffer.flush()
+
+
+def flush_all():
+    for buffer in _buffers:
+        buffer.flush()
@@ -0,0 +1,174 @@
+import os
+import threading
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+from django.core.signals import request_finished, request_started
+from django.db.backends.postgresql import base, creation
+
+from core import metrics
+from core.db import pool as pool_module
+
+# (alias, database name, pid) -> ConnectionPool
+# Keyed by pid as well so that forked workers never share the sockets
+# opened by their parent
+_pools = {}
+_pools_lock = threading.Lock()
+
+request_started.connect(pool_module.start_request)
+request_finished.connect(pool_module.finish_request)
+
+
+def _health_check(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def _reset(connection):
+    # Hand connections back without any open transaction
+    if connection.closed:
+        return False
+    try:
+        status = connection.get_transaction_status()
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def get_pool(alias, settings_dict, conn_params):
+    key = (alias, settings_dict['NAME'], os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                config = settings_dict.get('POOL', {})
+
+                def connect():
+                    connection = base.Database.connect(**conn_params)
+                    # Same as the stock backend
+                    psycopg2.extras.register_default_jsonb(
+                        conn_or_curs=connection, loads=lambda x: x)
+                    return connection
+
+                pool = pool_module.ConnectionPool(
+                    connect,
+                    min_size=config.get('MIN_SIZE', 0),
+                    max_size=config.get('MAX_SIZE', 10),
+                    max_lifetime=config.get('MAX_LIFETIME', 3600),
+                    max_idle=config.get('MAX_IDLE', 300),
+                    timeout=config.get('TIMEOUT', 10),
+                    health_check_after=config.get('HEALTH_CHECK_AFTER', 30),
+                    health_check=_health_check,
+                    reset=_reset,
+                )
+                pool.prefill()
+                _pools[key] = pool
+    return pool
+
+
+def pool_stats():
+    # Stats of the pools of the current process, by database alias
+    pid = os.getpid()
+    return {
+        alias: pool.get_stats()
+        for (alias, _, pool_pid), pool in list(_pools.items())
+        if pool_pid == pid
+    }
+
+
+def close_pools(name):
+    # Close the pooled connections to a database, e.g. before dropping it
+    with _pools_lock:
+        keys = [key for key in _pools if key[1] == name]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        pool.closeall()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep DROP DATABASE from running
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+def pool_metrics():
+    # Collector for core.metrics
+    stats = pool_stats()
+    for name, metric_type, key, help_text in (
+        ('app_db_pool_checkouts_total', 'counter', 'checkouts',
+         'Connections checked out of the pool.'),
+        ('app_db_pool_wait_seconds_total', 'counter', 'wait_seconds_total',
+         'Time spent waiting for a connection.'),
+        ('app_db_pool_wait_seconds_max', 'gauge', 'wait_seconds_max',
+         'Longest wait for a connection.'),
+        ('app_db_pool_timeouts_total', 'counter', 'timeouts',
+         'Checkouts that gave up waiting.'),
+        ('app_db_pool_connections', 'gauge', 'size',
+         'Open connections.'),
+        ('app_db_pool_connections_in_use', 'gauge', 'in_use',
+         'Connections checked out.'),
+    ):
+        yield name, metric_type, help_text, [
+            ({'database': alias}, alias_stats[key])
+            for alias, alias_stats in stats.items()
+        ]
+    request_stats = dict(pool_module.request_stats)
+    yield (
+        'app_db_pool_request_checkouts_total', 'counter',
+        'Checkouts made while serving requests.',
+        [({}, request_stats['checkouts'])]
+    )
+    yield (
+        'app_db_pool_requests_total', 'counter',
+        'Requests served by this process.',
+        [({}, request_stats['requests'])]
+    )
+
+
+metrics.register_collector(pool_metrics)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # PostgreSQL backend borrowing connections from a per-process pool
+    # Configured with the POOL key of the DATABASES entry
+    # Keep CONN_MAX_AGE at 0 with this backend: "closing" the connection at
+    # the end of the request hands it back to the pool for the next one
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        connection = get_pool(
+            self.alias, self.settings_dict, conn_params).getconn()
+
+        # Same as the stock backend, for connections being reused
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                get_pool(
+                    self.alias, self.settings_dict,
+                    self.get_connection_params(),
+                ).putconn(self.connection)
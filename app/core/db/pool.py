@@ -0,0 +1,187 @@
+import collections
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    # Raised when no connection could be checked out in time
+    pass
+
+
+class ConnectionPool:
+    # Thread-safe pool of DB-API connections
+    # - at most max_size connections are open, callers wait up to timeout
+    #   seconds for one to be handed back
+    # - connections older than max_lifetime are closed instead of reused
+    # - idle connections above min_size are closed after max_idle seconds
+    # - connections idle for longer than health_check_after seconds are
+    #   checked with health_check before being handed out
+    # The pool does not know about any driver: connect() opens a connection,
+    # health_check(conn) and reset(conn) return whether it is still usable
+
+    def __init__(self, connect, min_size=0, max_size=10, max_lifetime=3600,
+                 max_idle=300, timeout=10, health_check_after=30,
+                 health_check=None, reset=None):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._health_check = health_check or (lambda conn: True)
+        self._reset = reset or (lambda conn: True)
+
+        self._cond = threading.Condition()
+        # (connection, opened at, returned at), most recently used last
+        self._idle = collections.deque()
+        # id(connection) -> opened at, for checked out connections
+        self._in_use = {}
+        self._size = 0
+        self.stats = {
+            'checkouts': 0,
+            'opened': 0,
+            'closed': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def prefill(self):
+        # Open connections until min_size are available
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            now = time.monotonic()
+            with self._cond:
+                self._idle.appendleft((conn, now, now))
+                self._cond.notify()
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.stats['opened'] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.stats['closed'] += 1
+            self._cond.notify()
+
+    def _expired(self, opened, now):
+        return self.max_lifetime and now - opened >= self.max_lifetime
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            entry = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            'No connection available within %s seconds'
+                            % self.timeout)
+                    self._cond.wait(remaining)
+                if self._idle:
+                    # LIFO: the most recently used connection is the one
+                    # most likely to still be alive
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+
+            now = time.monotonic()
+            if entry is None:
+                conn, opened = self._open(), time.monotonic()
+            else:
+                conn, opened, returned = entry
+                if self._expired(opened, now) or (
+                        now - returned >= self.health_check_after
+                        and not self._health_check(conn)):
+                    self._discard(conn)
+                    continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._in_use[id(conn)] = opened
+                self.stats['checkouts'] += 1
+                self.stats['wait_seconds_total'] += waited
+                self.stats['wait_seconds_max'] = max(
+                    self.stats['wait_seconds_max'], waited)
+            _request_checkouts.count = getattr(
+                _request_checkouts, 'count', 0) + 1
+            return conn
+
+    def putconn(self, conn):
+        with self._cond:
+            opened = self._in_use.pop(id(conn), None)
+        if opened is None:
+            # Not one of ours
+            conn.close()
+            return
+        now = time.monotonic()
+        if self._expired(opened, now) or not self._reset(conn):
+            self._discard(conn)
+            return
+
+        stale = []
+        with self._cond:
+            self._idle.append((conn, opened, now))
+            # Trim connections idle for too long, oldest first
+            while (self._idle and self._size - len(stale) > self.min_size
+                   and now - self._idle[0][2] >= self.max_idle):
+                stale.append(self._idle.popleft()[0])
+            self._cond.notify()
+        for conn in stale:
+            self._discard(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, collections.deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = len(self._in_use)
+        return stats
+
+
+# Number of checkouts made by the current thread since the request started
+_request_checkouts = threading.local()
+
+# Distribution of checkouts per request, shared by every pool of the process
+request_stats = {'requests': 0, 'checkouts': 0, 'checkouts_max': 0}
+_request_stats_lock = threading.Lock()
+
+
+def start_request(**kwargs):
+    _request_checkouts.count = 0
+
+
+def finish_request(**kwargs):
+    count = getattr(_request_checkouts, 'count', 0)
+    _request_checkouts.count = 0
+    with _request_stats_lock:
+        request_stats['requests'] += 1
+        request_stats['checkouts'] += count
+        request_stats['checkouts_max'] = max(
+            request_stats['checkouts_max'], count)
@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+# Replication lag in seconds, 0 on a primary or a replica that caught up
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class _Pinning:
+    # Whether the current request must read from the primary, and whether it
+    # wrote anything
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# _Pinning of the current request, a context variable rather than a thread
+# local so that it follows requests served under ASGI, whose sync code runs
+# in other threads; outside of requests each thread gets its own
+_state = contextvars.ContextVar('replica_pinning', default=None)
+
+# alias -> (usable, checked at)
+_replica_health = {}
+# alias -> thread checking it
+_replica_checks = {}
+_replica_health_lock = threading.Lock()
+
+
+def _get_state():
+    state = _state.get()
+    if state is None:
+        state = _Pinning()
+        _state.set(state)
+    return state
+
+
+def pin_to_primary():
+    _get_state().pinned = True
+
+
+def unpin():
+    _state.set(_Pinning())
+
+
+def is_pinned():
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+def check_replica(alias):
+    # Returns the replication lag of a replica in seconds, or None when it
+    # cannot be reached
+    connection = connections[alias]
+    try:
+        if connection.vendor != 'postgresql':
+            connection.ensure_connection()
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        connection.close()
+        return None
+
+
+def _refresh_health(alias):
+    # Runs on its own thread, with its own connection to the replica
+    try:
+        lag = check_replica(alias)
+        usable = lag is not None and lag <= settings.REPLICA_MAX_LAG
+        with _replica_health_lock:
+            _replica_health[alias] = (usable, time.monotonic())
+    finally:
+        # The connections of this thread only
+        connections.close_all()
+        with _replica_health_lock:
+            if _replica_checks.get(alias) is threading.current_thread():
+                del _replica_checks[alias]
+
+
+def is_replica_usable(alias):
+    # Replicas are checked at most every REPLICA_CHECK_INTERVAL seconds per
+    # process, the result is shared by every thread in between
+    # Checks run on a background thread, requests never wait for one: they
+    # keep the last result meanwhile (the primary for a replica never
+    # checked), so a replica that does not answer never blocks them
+    health = _replica_health.get(alias)
+    if (health is not None and time.monotonic() - health[1]
+            < settings.REPLICA_CHECK_INTERVAL):
+        return health[0]
+    with _replica_health_lock:
+        check = _replica_checks.get(alias)
+        # Not alive in a worker forked while the master was checking
+        if check is None or not check.is_alive():
+            check = _replica_checks[alias] = threading.Thread(
+                target=_refresh_health, args=(alias,),
+                name='replica-check-%s' % alias, daemon=True)
+            check.start()
+    return health[0] if health is not None else False
+
+
+class ReplicaRouter:
+    # Sends reads to a random usable replica from DATABASE_REPLICAS and
+    # writes to the primary (default)
+    # Once a request has written something, or for any unsafe request, the
+    # reads go to the primary too so that it sees its own writes
+    # Lagging or unreachable replicas are skipped, and reads fall back to the
+    # primary when no replica is usable
+
+    def db_for_read(self, model, **hints):
+        if is_pinned():
+            return DEFAULT_DB_ALIAS
+        replicas = [
+            alias for alias in settings.DATABASE_REPLICAS
+            if is_replica_usable(alias)
+        ]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _get_state()
+        state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    # Pins requests to the primary when needed:
+    # - unsafe requests (POST, PATCH...), whose validation must not read
+    #   stale rows
+    # - requests from a client that wrote something less than
+    #   REPLICA_PIN_SECONDS ago, so that it reads its own writes
+    # Sync and async capable: under ASGI, a sync only middleware would run
+    # every request of the worker through Django's single sync thread
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'pin_primary'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Tells Django's handler to await it, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+            self.finish(response)
+        finally:
+            _state.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+            self.finish(response)
+        finally:
+            _state.reset(token)
+        return response
+
+    def start(self, request):
+        return _state.set(_Pinning(
+            pinned=request.method not in self.safe_methods
+            or self.cookie_name in request.COOKIES))
+
+    def finish(self, response):
+        if _state.get().wrote:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True)
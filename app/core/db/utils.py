@@ -0,0 +1,42 @@
+import contextlib
+import time
+
+from django.db import connections, router, transaction
+
+
+def savepoint_if_atomic(using=None):
+    # Context for a write that may raise IntegrityError, e.g. an INSERT that
+    # relies on a unique constraint
+    # Inside a transaction the error would break it for every later query,
+    # so the write gets a savepoint; in autocommit mode the statement is on
+    # its own already and BEGIN/COMMIT would only add round trips
+    if transaction.get_connection(using).in_atomic_block:
+        return transaction.atomic(using=using)
+    return contextlib.nullcontext()
+
+
+def delete_in_chunks(queryset, chunk_size=5000, sleep=0):
+    # Delete the rows of queryset chunk_size at a time, each chunk in its
+    # own short transaction running a plain DELETE by primary key: the
+    # table is never locked for long and no rows get loaded through the
+    # deletion collector (so no signals and no cascades either)
+    # Returns the number of rows deleted
+    # Reads of the queryset would go to a replica
+    using = queryset._db or router.db_for_write(queryset.model)
+    connection = connections[using]
+    opts = queryset.model._meta
+    sql = 'DELETE FROM %s WHERE %s IN (%%s)' % (
+        connection.ops.quote_name(opts.db_table),
+        connection.ops.quote_name(opts.pk.column))
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by().values_list(
+            'pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(sql % ', '.join(['%s'] * len(pks)), pks)
+                deleted += cursor.rowcount
+        if sleep:
+            time.sleep(sleep)
@@ -0,0 +1,53 @@
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+
+# Readable fields of user.serializers.UserSerializer, plus the primary key
+EXPORT_FIELDS = ('id', 'email', 'name')
+
+
+def iter_users(page_size=2000, using=None):
+    # Yield (id, email, name) tuples for every user without loading the
+    # table in memory
+    # Pages are fetched with keyset pagination on id (the ordering used by
+    # core.admin.UserAdmin), so every page is an index range scan no matter
+    # how deep into the table it is, unlike OFFSET pagination
+    queryset = get_user_model().objects.using(using).order_by('id')
+    last_id = 0
+    while True:
+        page = queryset.filter(id__gt=last_id).values_list(
+            *EXPORT_FIELDS)[:page_size]
+        count = 0
+        # iterator() streams the page through a server-side cursor on
+        # PostgreSQL instead of fetching it in one go
+        for row in page.iterator(chunk_size=page_size):
+            count += 1
+            last_id = row[0]
+            yield row
+        if count < page_size:
+            return
+
+
+class _Echo:
+    # File-like object handing back what csv.writer writes
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
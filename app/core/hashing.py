@@ -0,0 +1,222 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from core import profiling
+
+
+class HashingPoolSaturated(Exception):
+    # Raised when too many hashing jobs are already queued, so that the
+    # caller can answer with 503 instead of piling up more work
+    pass
+
+
+def _init_worker(settings_module):
+    # Worker processes need the same PASSWORD_HASHERS as the web process
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+# The functions below run inside the worker processes
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _make_passwords(passwords):
+    return [hashers.make_password(password) for password in passwords]
+
+
+def _verify_password(password, encoded):
+    # Returns whether the password matches and whether the stored hash
+    # uses outdated parameters and should be upgraded
+    outdated = []
+    valid = hashers.check_password(
+        password, encoded, setter=lambda raw: outdated.append(True))
+    return valid, bool(outdated)
+
+
+class PasswordHashingPool:
+    # Process pool running the CPU heavy password hashers (PBKDF2 by default)
+    # so they scale across cores instead of pinning the request thread
+    # At most max_pending jobs may be queued or running at once
+
+    def __init__(self, workers=None, max_pending=None, timeout=30):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_init_worker,
+                        initargs=(getattr(settings, 'SETTINGS_MODULE', ''),),
+                    )
+        return self._executor
+
+    def _release(self, future):
+        self._slots.release()
+
+    def submit(self, fn, *args, wait=False):
+        # wait=False fails fast when the pool is saturated (request path),
+        # wait=True blocks until a slot frees up (batch jobs)
+        if not self._slots.acquire(blocking=wait):
+            raise HashingPoolSaturated()
+        try:
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died, start over with a fresh pool
+                with self._lock:
+                    self._executor = None
+                future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, *args, wait=False):
+        future = self.submit(fn, *args, wait=wait)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingPoolSaturated()
+
+    async def arun(self, fn, *args):
+        # Coroutine version of run(), awaiting the job instead of blocking
+        # the event loop
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise HashingPoolSaturated()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # Returns the process wide pool, or None when PASSWORD_HASHING_POOL
+    # disables it and hashing should run inline
+    global _pool
+    config = getattr(settings, 'PASSWORD_HASHING_POOL', {})
+    if not config.get('ENABLED', False):
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashingPool(
+                    workers=config.get('WORKERS'),
+                    max_pending=config.get('MAX_PENDING'),
+                    timeout=config.get('TIMEOUT', 30),
+                )
+    return _pool
+
+
+def make_password(password):
+    # Drop-in replacement for django.contrib.auth.hashers.make_password
+    pool = get_pool()
+    with profiling.section('password_hash'):
+        # Unusable passwords do not run the hasher
+        if pool is None or password is None:
+            return hashers.make_password(password)
+        return pool.run(_make_password, password)
+
+
+async def amake_password(password):
+    # Coroutine version of make_password for async views
+    # Without the pool the hasher runs on a thread of the default executor
+    pool = get_pool()
+    with profiling.section('password_hash'):
+        if pool is None or password is None:
+            return await sync_to_async(
+                hashers.make_password, thread_sensitive=False)(password)
+        return await pool.arun(_make_password, password)
+
+
+def make_passwords(passwords, pool=None, chunk_size=64):
+    # Hash many passwords, spreading chunks of them over the pool workers
+    # Blocks rather than failing when the pool is busy
+    passwords = list(passwords)
+    pool = pool or get_pool()
+    with profiling.section('password_hash'):
+        if pool is None:
+            return _make_passwords(passwords)
+        futures = [
+            pool.submit(
+                _make_passwords, passwords[i:i + chunk_size], wait=True)
+            for i in range(0, len(passwords), chunk_size)
+        ]
+        hashed = []
+        for future in futures:
+            hashed.extend(future.result())
+        return hashed
+
+
+def set_password(user, password):
+    # Same as user.set_password, with the hashing done on the pool
+    user.password = make_password(password)
+    user._password = password
+
+
+async def aset_password(user, password):
+    user.password = await amake_password(password)
+    user._password = password
+
+
+def check_password(user, password):
+    # Same as user.check_password, with the hashing done on the pool
+    pool = get_pool()
+    with profiling.section('password_hash'):
+        if pool is None:
+            return user.check_password(password)
+        valid, outdated = pool.run(
+            _verify_password, password, user.password)
+    if valid and outdated:
+        # Upgrade the stored hash like AbstractBaseUser.check_password does
+        set_password(user, password)
+        user.save(update_fields=['password'])
+    return valid
+
+
+async def acheck_password(user, password):
+    # Coroutine version of check_password for async views
+    pool = get_pool()
+    with profiling.section('password_hash'):
+        if pool is None:
+            valid, outdated = await sync_to_async(
+                _verify_password, thread_sensitive=False)(
+                password, user.password)
+        else:
+            valid, outdated = await pool.arun(
+                _verify_password, password, user.password)
+    if valid and outdated:
+        await aset_password(user, password)
+        await sync_to_async(user.save)(update_fields=['password'])
+    return valid
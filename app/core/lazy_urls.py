@@ -0,0 +1,75 @@
+from django.urls import URLResolver
+from django.urls.resolvers import RoutePattern
+from django.utils.module_loading import import_string
+
+# URL patterns whose views or URLconf are only imported when needed, to
+# keep the admin and the API docs (and their imports) out of the worker
+# startup, see app/urls.py
+# The first reverse() of any URL populates the whole resolver tree, which
+# imports every URLconf and view it holds: these are built so that it does
+# not
+
+
+class LazyURLResolver(URLResolver):
+    # Namespaced include() of a URLconf imported on the first URL resolved
+    # under its prefix or reversed in its namespace
+    # Its parent only needs the namespace to reverse the other URLs, so
+    # populating it waits until the URLconf is loaded
+
+    def _populate(self):
+        if 'urlconf_module' in self.__dict__:
+            super()._populate()
+
+    @property
+    def reverse_dict(self):
+        self.urlconf_module
+        return super().reverse_dict
+
+    @property
+    def namespace_dict(self):
+        self.urlconf_module
+        return super().namespace_dict
+
+    @property
+    def app_dict(self):
+        self.urlconf_module
+        return super().app_dict
+
+
+def lazy_include(route, module, namespace):
+    # path(route, include((module, namespace))) with a LazyURLResolver
+    return LazyURLResolver(
+        RoutePattern(route, is_endpoint=False), module,
+        app_name=namespace, namespace=namespace)
+
+
+class LazyView:
+    # Stands for ViewClass.as_view(**initkwargs), ViewClass being imported
+    # on the first request, or when its attributes are read (e.g. .cls by
+    # the schema generator)
+    # Only for Django REST framework views, which are all CSRF exempt
+
+    csrf_exempt = True
+
+    def __init__(self, view_path, **initkwargs):
+        self._view_path = view_path
+        self._initkwargs = initkwargs
+        self._view = None
+        # Read when the resolver is populated
+        self.__module__, _, self.__name__ = view_path.rpartition('.')
+        self.__qualname__ = self.__name__
+
+    def _get_view(self):
+        if self._view is None:
+            self._view = import_string(self._view_path).as_view(
+                **self._initkwargs)
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self._get_view()(request, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Only called for attributes this object does not have
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._get_view(), name)
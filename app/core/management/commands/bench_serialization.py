@@ -0,0 +1,152 @@
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from rest_framework import negotiation, parsers, renderers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.negotiation import FastContentNegotiation
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from user.serializers import AsyncTokenSerializer, UserSerializer
+
+
+class StdlibJSONRenderer(FastJSONRenderer):
+    # The fallback used when orjson is not installed
+    use_orjson = False
+
+
+class StdlibJSONParser(FastJSONParser):
+    use_orjson = False
+
+
+class StockUserSerializer(UserSerializer):
+    # Fields built on every instantiation, like a plain ModelSerializer
+    cache_fields = False
+
+
+class StockTokenSerializer(AsyncTokenSerializer):
+    # AsyncTokenSerializer only validates the fields, without any query
+    cache_fields = False
+
+
+def user_rows(count):
+    return [
+        {'email': 'user%d@example.com' % i, 'name': 'User %d' % i}
+        for i in range(count)
+    ]
+
+
+def render_cases(data):
+    implementations = [
+        ('drf', renderers.JSONRenderer()), ('stdlib', StdlibJSONRenderer())]
+    if FastJSONRenderer.use_orjson:
+        implementations.append(('orjson', FastJSONRenderer()))
+    return [
+        (name, lambda renderer=renderer: renderer.render(data))
+        for name, renderer in implementations
+    ]
+
+
+def parse_cases(data):
+    body = renderers.JSONRenderer().render(data)
+    implementations = [
+        ('drf', parsers.JSONParser()), ('stdlib', StdlibJSONParser())]
+    if FastJSONParser.use_orjson:
+        implementations.append(('orjson', FastJSONParser()))
+    return [
+        (name, lambda parser=parser: parser.parse(io.BytesIO(body)))
+        for name, parser in implementations
+    ]
+
+
+def negotiation_cases():
+    request = Request(APIRequestFactory().get('/', HTTP_ACCEPT='*/*'))
+    available = [
+        renderers.JSONRenderer(), renderers.BrowsableAPIRenderer()]
+    return [
+        (name, lambda negotiator=negotiator: negotiator.select_renderer(
+            request, available))
+        for name, negotiator in (
+            ('drf', negotiation.DefaultContentNegotiation()),
+            ('fast', FastContentNegotiation()),
+        )
+    ]
+
+
+def serializer_cases():
+    user = get_user_model()(id=1, email='test@example.com', name='Test')
+    credentials = {'email': 'test@example.com', 'password': 'password'}
+
+    def validate(serializer_class):
+        serializer = serializer_class(data=credentials)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    return [
+        ('UserSerializer.data', [
+            ('stock', lambda: StockUserSerializer(user).data),
+            ('cached', lambda: UserSerializer(user).data),
+            ('represent', lambda: UserSerializer.represent(user)),
+        ]),
+        ('TokenSerializer valid', [
+            ('stock', lambda: validate(StockTokenSerializer)),
+            ('cached', lambda: validate(AsyncTokenSerializer)),
+        ]),
+    ]
+
+
+def get_groups(rows):
+    # (group, [(name, function)]), the first function of a group is the
+    # baseline the others are compared to
+    user = user_rows(1)[0]
+    users = user_rows(rows)
+    return [
+        ('render user', render_cases(user)),
+        ('render %d users' % rows, render_cases(users)),
+        ('parse user', parse_cases(user)),
+        ('parse %d users' % rows, parse_cases(users)),
+        ('negotiate */*', negotiation_cases()),
+        *serializer_cases(),
+    ]
+
+
+def measure(function, iterations):
+    # Best of 3 runs, in microseconds per call
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / iterations * 1e6
+
+
+class Command(BaseCommand):
+    # Django command timing the per request (de)serialization work of the API
+    # in isolation, as a complement to bench_user_api
+    help = ('Microbenchmark JSON rendering, parsing, content negotiation and '
+            'the user serializers.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=2000,
+            help='Calls per measurement')
+        parser.add_argument(
+            '--rows', type=int, default=100,
+            help='Users in the list payloads')
+
+    def handle(self, *args, **options):
+        self.stdout.write('%-22s %-8s %10s %8s' % (
+            'case', 'impl', 'us/call', 'speedup'))
+        for group, cases in get_groups(options['rows']):
+            baseline = None
+            for name, function in cases:
+                spent = measure(function, options['iterations'])
+                baseline = baseline or spent
+                self.stdout.write('%-22s %-8s %10.2f %7.2fx' % (
+                    group, name, spent, baseline / spent))
@@ -0,0 +1,358 @@
+import json
+import platform
+import queue
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+
+ENDPOINTS = ('create', 'token', 'currentuser')
+PASSWORD = 'bench-password'
+
+
+class InProcessTarget:
+    # Sends requests through the Django test client, in this process
+    # Also counts the queries run by each request
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, data=None, token=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = APIClient()
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        headers = {'HTTP_AUTHORIZATION': 'Token ' + token} if token else {}
+        with ExitStack() as stack:
+            for alias_connection in connections.all():
+                stack.enter_context(alias_connection.execute_wrapper(count))
+            response = getattr(client, method)(
+                path, data, format='json', **headers)
+        return (
+            response.status_code, getattr(response, 'data', None),
+            len(queries))
+
+
+class HttpTarget:
+    # Sends requests to a running server, e.g. to compare serving setups
+    # Queries cannot be counted from the outside
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method.upper())
+        request.add_header('Content-Type', 'application/json')
+        request.add_header('Accept', 'application/json')
+        if token:
+            request.add_header('Authorization', 'Token ' + token)
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            status, content = exc.code, exc.read()
+        try:
+            content = json.loads(content)
+        except ValueError:
+            # Kept as text for the error messages, e.g. a proxy error page
+            content = content.decode('utf-8', 'replace')
+        return status, content, None
+
+
+def percentile(values, percent):
+    # Nearest-rank percentile of sorted values
+    if not values:
+        return None
+    index = max(0, int(round(percent / 100 * len(values) + 0.5)) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for latency, _, _ in samples)
+    queries = [count for _, _, count in samples if count is not None]
+    errors = sum(1 for _, status, _ in samples if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': len(samples) / elapsed if elapsed else None,
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies) * 1000,
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'max': latencies[-1] * 1000,
+        },
+        'queries_per_request': (
+            sum(queries) / len(queries) if queries else None),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    # Django command to benchmark the user API endpoints
+    # By default requests go through the Django test client against a
+    # throwaway test database (PostgreSQL, or SQLite with a settings module
+    # pointing at it); --base-url benchmarks a running server instead
+    help = 'Benchmark the user API endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoints', default=','.join(ENDPOINTS),
+            help='Comma separated endpoints among %s' % ', '.join(ENDPOINTS))
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests sent to each endpoint')
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Requests in flight at once')
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Users created up front for the token and currentuser '
+                 'endpoints')
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Requests sent to each endpoint before measuring')
+        parser.add_argument(
+            '--base-url',
+            help='Benchmark a running server, e.g. http://localhost:8000')
+        parser.add_argument(
+            '--no-test-db', action='store_true',
+            help='Use the configured database as is instead of creating a '
+                 'test database')
+        parser.add_argument(
+            '--output', help='Write the results to this JSON file')
+        parser.add_argument(
+            '--compare', help='Previous JSON results to compare against')
+
+    def handle(self, *args, **options):
+        endpoints = [
+            name.strip() for name in options['endpoints'].split(',')]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(
+                'Unknown endpoints: %s' % ', '.join(sorted(unknown)))
+        for option in ('requests', 'concurrency', 'users'):
+            if options[option] < 1:
+                raise CommandError('--%s must be at least 1' % option)
+        if options['warmup'] < 0:
+            raise CommandError('--warmup cannot be negative')
+
+        test_db = None
+        if not options['base_url'] and not options['no_test_db']:
+            test_db = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True)
+        try:
+            if options['base_url']:
+                results = self.run(
+                    HttpTarget(options['base_url']), endpoints, options)
+            else:
+                # Host used by the test client, like the test runner does
+                # The login throttle would reject most token requests
+                with override_settings(
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                        LOGIN_THROTTLE=dict(
+                            settings.LOGIN_THROTTLE, ENABLED=False)):
+                    results = self.run(InProcessTarget(), endpoints, options)
+        finally:
+            if test_db is not None:
+                connections.close_all()
+                connection.creation.destroy_test_db(
+                    connection.settings_dict['NAME'], verbosity=0)
+
+        report = {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'target': options['base_url'] or 'in-process',
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        self.print_report(report)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(json.load(f), report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def setup_users(self, target, count, run_id):
+        # Returns (email, token) pairs of users the benchmark can log in as
+        users = []
+        if isinstance(target, HttpTarget):
+            for i in range(count):
+                email = 'bench-%s-user%d@example.com' % (run_id, i)
+                status, content, _ = target.request(
+                    'post', reverse('user:create'), {
+                        'email': email, 'password': PASSWORD, 'name': 'Bench'})
+                if status != 201:
+                    raise CommandError(
+                        'Could not create the user %s (HTTP %d): %s'
+                        % (email, status, content))
+                status, content, _ = target.request(
+                    'post', reverse('user:token'), {
+                        'email': email, 'password': PASSWORD})
+                if (status != 200 or not isinstance(content, dict)
+                        or 'token' not in content):
+                    raise CommandError(
+                        'Could not log in as %s (HTTP %d): %s'
+                        % (email, status, content))
+                users.append((email, content['token']))
+            return users
+
+        created, _ = get_user_model().objects.bulk_create_users([
+            {
+                'email': 'bench-%s-user%d@example.com' % (run_id, i),
+                'password': PASSWORD,
+                'name': 'Bench',
+            }
+            for i in range(count)
+        ])
+        for user in get_user_model().objects.filter(
+                email__in=[user.email for user in created]):
+            users.append((user.email, AuthToken.objects.issue(user).key))
+        return users
+
+    def make_requests(self, endpoint, count, users, run_id, offset):
+        # (method, path, data, token) for each request of the endpoint
+        if endpoint == 'create':
+            path = reverse('user:create')
+            return [
+                ('post', path, {
+                    'email': 'bench-%s-new%d@example.com' % (
+                        run_id, offset + i),
+                    'password': PASSWORD,
+                    'name': 'Bench',
+                }, None)
+                for i in range(count)
+            ]
+        if endpoint == 'token':
+            path = reverse('user:token')
+            return [
+                ('post', path, {
+                    'email': users[i % len(users)][0],
+                    'password': PASSWORD,
+                }, None)
+                for i in range(count)
+            ]
+        path = reverse('user:currentuser')
+        return [
+            ('get', path, None, users[i % len(users)][1])
+            for i in range(count)
+        ]
+
+    def run(self, target, endpoints, options):
+        run_id = uuid.uuid4().hex[:8]
+        users = self.setup_users(target, options['users'], run_id)
+        concurrency = options['concurrency']
+
+        def send(request):
+            started = time.perf_counter()
+            status, _, queries = target.request(*request)
+            return time.perf_counter() - started, status, queries
+
+        results = {}
+        for endpoint in endpoints:
+            warmup = self.make_requests(
+                endpoint, options['warmup'], users, run_id, 0)
+            requests = self.make_requests(
+                endpoint, options['requests'], users, run_id,
+                options['warmup'])
+            for request in warmup:
+                send(request)
+
+            started = time.perf_counter()
+            if concurrency > 1:
+                samples = self.run_concurrently(send, requests, concurrency)
+            else:
+                samples = [send(request) for request in requests]
+            results[endpoint] = summarize(
+                samples, time.perf_counter() - started)
+        return results
+
+    def run_concurrently(self, send, requests, concurrency):
+        pending = queue.Queue()
+        for request in requests:
+            pending.put(request)
+        samples = []
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        request = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    samples.append(send(request))
+            finally:
+                # Let the test database be dropped afterwards
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples
+
+    def print_report(self, report):
+        self.stdout.write(
+            '%-12s %8s %7s %9s %9s %9s %9s %8s' % (
+                'endpoint', 'requests', 'errors', 'req/s',
+                'p50 ms', 'p95 ms', 'p99 ms', 'queries'))
+        for endpoint, result in report['results'].items():
+            latency = result['latency_ms']
+            queries = result['queries_per_request']
+            self.stdout.write(
+                '%-12s %8d %7d %9.1f %9.2f %9.2f %9.2f %8s' % (
+                    endpoint, result['requests'], result['errors'],
+                    result['throughput_rps'], latency['p50'],
+                    latency['p95'], latency['p99'],
+                    '-' if queries is None else '%.1f' % queries))
+
+    def print_comparison(self, previous, report):
+        self.stdout.write('Compared with %s (%s):' % (
+            previous.get('revision'), previous.get('timestamp')))
+        for endpoint, result in report['results'].items():
+            before = previous['results'].get(endpoint)
+            if before is None:
+                continue
+            self.stdout.write('%-12s p95 %+.1f%%, req/s %+.1f%%' % (
+                endpoint,
+                (result['latency_ms']['p95'] / before['latency_ms']['p95']
+                 - 1) * 100,
+                (result['throughput_rps'] / before['throughput_rps'] - 1)
+                * 100,
+            ))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import schema
+
+
+class Command(BaseCommand):
+    # Django command writing the OpenAPI schema to a file at build/deploy
+    # time, so that workers load it instead of introspecting the API (see
+    # core.schema and the API_SCHEMA_FILE setting)
+    help = 'Generate the OpenAPI schema artifact served by /api/schema/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='File to write, defaults to the API_SCHEMA_FILE setting')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.API_SCHEMA_FILE
+        if not path:
+            raise CommandError(
+                'Pass --output or set API_SCHEMA_FILE.')
+        version = schema.write_artifact(path)
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote schema %s to %s' % (version, path)))
@@ -0,0 +1,174 @@
+import csv
+import itertools
+import json
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import hashing
+
+# Columns read from the input file, anything else is ignored
+FIELDS = ('email', 'password', 'name')
+
+
+def read_rows(path, file_format):
+    # Lazily yield one (line number, record) per record so that files of any
+    # size can be read
+    # A malformed NDJSON line is yielded as its ValueError, rejected by
+    # normalize() like any other bad row
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(source, 1):
+                line = line.strip()
+                try:
+                    yield number, json.loads(line) if line else {}
+                except ValueError as e:
+                    yield number, e
+
+
+def normalize(rows, stats, rejected):
+    # Keep the known columns and normalize the email address the same way
+    # UserManager.create_user does
+    # Rows that cannot be read are counted and added to rejected as (line
+    # number, reason), rows without an email are only counted
+    manager = get_user_model().objects
+    for number, row in rows:
+        if isinstance(row, ValueError):
+            reason = 'malformed JSON (%s)' % row
+        elif not isinstance(row, dict):
+            reason = 'not an object'
+        else:
+            # Anything else would fail in the hasher or the INSERT, and
+            # stop the import on the same row after every resume
+            reason = next((
+                '%s is not a string' % field for field in FIELDS
+                if not isinstance(row.get(field) or '', str)), None)
+        if reason is not None:
+            stats['rejected'] += 1
+            rejected.append((number, reason))
+            continue
+        email = (row.get('email') or '').strip()
+        if not email:
+            stats['invalid'] += 1
+            continue
+        user = {field: row[field] for field in FIELDS if row.get(field)}
+        user['email'] = manager.normalize_email(email)
+        yield user
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def dedupe(chunk, stats):
+    # Drop users that already exist with one query per chunk
+    # Earlier chunks are committed before the next one is read, so this also
+    # catches duplicates spread across the file
+    existing = set(get_user_model().objects.filter(
+        email__in=[user['email'] for user in chunk]
+    ).values_list('email', flat=True))
+    new = [user for user in chunk if user['email'] not in existing]
+    stats['skipped'] += len(chunk) - len(new)
+    return new
+
+
+class Command(BaseCommand):
+    # Django command to import users from a CSV or NDJSON file
+    # Rows stream through parse -> normalize -> dedupe -> hash -> bulk_create
+    # one chunk at a time, so memory use does not depend on the file size
+    help = 'Import users from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'],
+            help='Input format, guessed from the file extension by default')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows hashed and inserted per chunk')
+        parser.add_argument(
+            '--workers', type=int,
+            help='Processes used to hash passwords, defaults to the '
+                 'PASSWORD_HASHING_POOL setting')
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress, defaults to <path>.checkpoint')
+        parser.add_argument(
+            '--no-resume', action='store_true',
+            help='Ignore an existing checkpoint and start from the top')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError('File "%s" does not exist' % path)
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson')
+        checkpoint = options['checkpoint'] or path + '.checkpoint'
+
+        done = 0
+        if os.path.exists(checkpoint) and not options['no_resume']:
+            with open(checkpoint) as f:
+                done = json.load(f)['rows']
+            self.stdout.write('Resuming after row %d' % done)
+
+        pool = None
+        if options['workers']:
+            pool = hashing.PasswordHashingPool(workers=options['workers'])
+
+        stats = {
+            'invalid': 0, 'rejected': 0, 'skipped': 0, 'created': 0,
+            'failed': 0,
+        }
+        batch_size = options['batch_size']
+        manager = get_user_model().objects
+        started = time.monotonic()
+        read = 0
+
+        # Rows are counted before normalization so that the checkpoint
+        # always refers to positions in the input file
+        rows = itertools.islice(read_rows(path, file_format), done, None)
+        try:
+            for raw_chunk in chunked(rows, batch_size):
+                rejected = []
+                chunk = dedupe(
+                    list(normalize(raw_chunk, stats, rejected)), stats)
+                for number, reason in rejected:
+                    self.stderr.write(
+                        'Line %d rejected: %s' % (number, reason))
+                users, errors = manager.bulk_create_users(
+                    chunk, batch_size=batch_size, pool=pool)
+                stats['created'] += len(users)
+                stats['failed'] += len(errors)
+
+                read += len(raw_chunk)
+                done += len(raw_chunk)
+                with open(checkpoint, 'w') as f:
+                    json.dump({'rows': done}, f)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    '%d rows read, %d created, %d skipped, %d invalid, '
+                    '%d rejected, %d failed (%.0f rows/s)' % (
+                        done, stats['created'], stats['skipped'],
+                        stats['invalid'], stats['rejected'], stats['failed'],
+                        read / elapsed if elapsed else 0,
+                    ))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %d users' % stats['created']))
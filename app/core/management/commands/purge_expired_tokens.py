@@ -0,0 +1,49 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.db.utils import delete_in_chunks
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    # Django command deleting expired auth tokens in small chunks, see
+    # core.db.utils.delete_in_chunks
+    help = 'Delete expired auth tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Tokens deleted per transaction')
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to wait between chunks')
+        parser.add_argument(
+            '--older-than', type=int, default=0,
+            help='Only delete tokens expired for at least this many seconds')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the tokens that would be deleted')
+        parser.add_argument(
+            '--database', default='default',
+            help='Database to purge')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=options['older_than'])
+        expired = AuthToken.objects.using(using).filter(expires_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write('%d expired tokens' % expired.count())
+            return
+
+        started = time.monotonic()
+        deleted = delete_in_chunks(
+            expired, options['chunk_size'], options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted %d expired tokens in %.1fs' % (
+                deleted, time.monotonic() - started)))
@@ -0,0 +1,51 @@
+import datetime
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.db.utils import delete_in_chunks
+
+
+class Command(BaseCommand):
+    # Django command deleting expired sessions from the database in small
+    # chunks (see core.db.utils.delete_in_chunks), unlike clearsessions
+    # which deletes them all in one statement
+    # Expired sessions are refused anyway, this only keeps the table small
+    help = 'Delete expired sessions from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Sessions deleted per transaction')
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to wait between chunks')
+        parser.add_argument(
+            '--older-than', type=int, default=0,
+            help='Only delete sessions expired for at least this many seconds')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the sessions that would be deleted')
+        parser.add_argument(
+            '--database', default='default',
+            help='Database to purge')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=options['older_than'])
+        # Uses the expire_date index
+        expired = Session.objects.using(options['database']).filter(
+            expire_date__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write('%d expired sessions' % expired.count())
+            return
+
+        started = time.monotonic()
+        deleted = delete_in_chunks(
+            expired, options['chunk_size'], options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted %d expired sessions in %.1fs' % (
+                deleted, time.monotonic() - started)))
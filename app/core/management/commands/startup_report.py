@@ -0,0 +1,61 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import startup
+
+
+class Command(BaseCommand):
+    # Django command reporting how long a fresh worker takes to load the
+    # settings, the apps, the middleware and the URLconf, and which modules
+    # the time goes to; compare settings modules with --settings, e.g.
+    # app.settings_api
+    help = 'Report the startup time of a worker and its slowest imports.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help='Fresh starts timed, the best time of each phase is kept')
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Packages and modules listed')
+        parser.add_argument(
+            '--output', help='Write the report to this JSON file')
+
+    def handle(self, *args, **options):
+        settings_module = os.environ['DJANGO_SETTINGS_MODULE']
+        try:
+            phases, imports = startup.report(
+                settings_module, runs=options['runs'], cwd=settings.BASE_DIR)
+        except startup.ProbeError as exc:
+            raise CommandError('The worker did not start: %s' % exc)
+        packages = startup.by_package(imports)
+        modules = sorted(imports, key=lambda module: -module.self_ms)
+
+        self.stdout.write('Startup of %s (best of %d)' % (
+            settings_module, options['runs']))
+        for phase, ms in phases.items():
+            self.stdout.write('  %-12s %8.1f ms' % (phase, ms))
+        self.stdout.write(self.style.SUCCESS(
+            '  %-12s %8.1f ms' % ('total', sum(phases.values()))))
+        self.stdout.write(
+            '%d modules imported, under -X importtime:' % len(imports))
+        self.stdout.write('  %-40s %8s' % ('package', 'self ms'))
+        for package, ms in packages[:options['top']]:
+            self.stdout.write('  %-40s %8.1f' % (package, ms))
+        self.stdout.write(
+            '  %-40s %8s %8s' % ('module', 'self ms', 'cumul ms'))
+        for module in modules[:options['top']]:
+            self.stdout.write('  %-40s %8.1f %8.1f' % (
+                module.module, module.self_ms, module.cumulative_ms))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'settings': settings_module,
+                    'phases': phases,
+                    'packages': dict(packages),
+                    'modules': [module._asdict() for module in imports],
+                }, output, indent=2)
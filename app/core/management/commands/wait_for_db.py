@@ -1,24 +1,84 @@
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Import conneciton moodules
 from django.db import connections
 from django.db.utils import OperationalError
 # Used to create custom command
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+
+def probe(alias):
+    # Actually open a connection and run a query
+    # Only fetching connections[alias] never talks to the server
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        # Connections are per thread, do not leak the probing one
+        connection.close()
 
 
 class Command(BaseCommand):
     # Django command to pause execution until database is available
+    # All configured databases are probed concurrently, each one retrying
+    # with exponential backoff and full jitter until the timeout
 
-    def handle(self, *args, **options):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database alias to wait for, may be repeated. '
+                 'Defaults to every configured database')
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before giving up')
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.1,
+            help='Seconds to wait after the first failed attempt')
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Upper bound of the wait between two attempts')
 
-        self.stdout.write('Waiting for database....')
-        db_conn = None
-        while not db_conn:
+    def wait_for(self, alias, deadline, initial_delay, max_delay):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
             try:
-                db_conn = connections['default']
+                probe(alias)
             except OperationalError:
+                now = time.monotonic()
+                if now >= deadline:
+                    raise CommandError(
+                        'Database "%s" still unavailable after %d attempts'
+                        % (alias, attempt))
+                delay = min(max_delay, initial_delay * 2 ** (attempt - 1))
+                delay = min(random.uniform(0, delay), deadline - now)
+                self.stdout.write(
+                    'Database "%s" is unavailable, waiting %.2f seconds...'
+                    % (alias, delay))
+                time.sleep(delay)
+            else:
+                return attempt, time.monotonic() - started
+
+    def handle(self, *args, **options):
+
+        self.stdout.write('Waiting for database....')
+        aliases = options['databases'] or list(connections)
+        deadline = time.monotonic() + options['timeout']
+
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            futures = {
+                alias: executor.submit(
+                    self.wait_for, alias, deadline,
+                    options['initial_delay'], options['max_delay'])
+                for alias in aliases
+            }
+            for alias, future in futures.items():
+                attempts, elapsed = future.result()
                 self.stdout.write(
-                    'Database is unavailabe, waiting for 1 second...')
-                time.sleep(1)
+                    'Database "%s" ready after %.2f seconds (%d attempts)'
+                    % (alias, elapsed, attempts))
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,105 @@
+import bisect
+import threading
+
+# Default buckets, in seconds
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_metrics = []
+_collectors = []
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in labels)
+
+
+class Counter:
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield '# HELP %s %s' % (self.name, self.help_text)
+        yield '# TYPE %s counter' % self.name
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield '%s%s %s' % (self.name, _format_labels(labels), value)
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        yield '# HELP %s %s' % (self.name, self.help_text)
+        yield '# TYPE %s histogram' % self.name
+        with self._lock:
+            values = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._values.items()
+            ]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield '%s_bucket%s %s' % (
+                    self.name,
+                    _format_labels(labels + (('le', bound),)),
+                    cumulative)
+            yield '%s_sum%s %s' % (self.name, _format_labels(labels), total)
+            yield '%s_count%s %s' % (
+                self.name, _format_labels(labels), cumulative)
+
+
+def register_collector(collector):
+    # collector() returns (name, type, help, [(labels dict, value)]) tuples,
+    # computed when the metrics are scraped, e.g. for cache or pool stats
+    _collectors.append(collector)
+
+
+def render():
+    # Every metric in the Prometheus text exposition format
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, metric_type, help_text, samples in collector():
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s %s' % (name, metric_type))
+            for labels, value in samples:
+                lines.append('%s%s %s' % (
+                    name, _format_labels(sorted(labels.items())), value))
+    return '\n'.join(lines) + '\n'
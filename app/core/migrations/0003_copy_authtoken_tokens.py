@@ -0,0 +1,44 @@
+import binascii
+import datetime
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+
+def copy_tokens(apps, schema_editor):
+    # Existing rest_framework.authtoken tokens keep working, with a full
+    # AUTH_TOKEN['TTL'] from now so that nobody gets logged out
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('core', 'AuthToken')
+    db = schema_editor.connection.alias
+    expires_at = timezone.now() + datetime.timedelta(
+        seconds=settings.AUTH_TOKEN['TTL'])
+
+    batch = []
+    for key, user_id, created in Token.objects.using(db).values_list(
+            'key', 'user_id', 'created').iterator(chunk_size=BATCH_SIZE):
+        batch.append(AuthToken(
+            raw_key=binascii.unhexlify(key),
+            user_id=user_id,
+            created_at=created,
+            expires_at=expires_at,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            AuthToken.objects.using(db).bulk_create(batch)
+            batch = []
+    AuthToken.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('core', '0002_authtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_tokens, migrations.RunPython.noop),
+    ]
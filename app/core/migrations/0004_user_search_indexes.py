@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# Indexes for the prefix search of UserAdmin (search_fields '^email' and
+# '^name'), which runs UPPER("column"::text) LIKE UPPER('term%')
+# text_pattern_ops makes LIKE usable on an index whatever the collation
+# Built CONCURRENTLY so that the user table stays writable, which needs a
+# non atomic migration
+INDEXES = [
+    ('core_user_email_upper_prefix', 'email'),
+    ('core_user_name_upper_prefix', 'name'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS %s ON core_user '
+            '(UPPER(%s::text) text_pattern_ops)' % (name, column))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_copy_authtoken_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
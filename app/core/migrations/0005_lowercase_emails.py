@@ -0,0 +1,100 @@
+from django.db import migrations, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Lower
+
+BATCH_SIZE = 5000
+
+# Conflicts listed in the error, the rest are only counted
+MAX_LISTED = 50
+
+
+def check_conflicts(users):
+    # Emails used by more than one account once lowercased have to be merged
+    # by hand before the migration runs, otherwise some of these users could
+    # not log in anymore
+    conflicts = list(
+        users.annotate(lowered=Lower('email'))
+        .values('lowered')
+        .annotate(accounts=Count('pk'))
+        .filter(accounts__gt=1)
+        .order_by('lowered')
+        .values_list('lowered', flat=True))
+    if not conflicts:
+        return
+    listed = []
+    for email in conflicts[:MAX_LISTED]:
+        pks = sorted(
+            users.filter(email__iexact=email).values_list('pk', flat=True))
+        listed.append('%s (users %s)' % (email, ', '.join(map(str, pks))))
+    if len(conflicts) > MAX_LISTED:
+        listed.append('and %d more' % (len(conflicts) - MAX_LISTED))
+    raise RuntimeError(
+        '%d emails are used by more than one account once lowercased, merge '
+        'these accounts and run the migration again: %s'
+        % (len(conflicts), '; '.join(listed)))
+
+
+def lowercase_emails(apps, schema_editor):
+    # Rewrites the emails that are not lowercase yet, one short transaction
+    # per batch, walking the table by id so that each batch resumes where
+    # the previous one stopped
+    # Fails without rewriting anything while some emails conflict, see
+    # check_conflicts(); the check runs again for each batch, a batch that
+    # fails is rolled back and a new run resumes after the committed ones
+    User = apps.get_model('core', 'User')
+    db = schema_editor.connection.alias
+    users = User.objects.using(db)
+    check_conflicts(users)
+    last_id = 0
+    while True:
+        batch = list(
+            users.filter(pk__gt=last_id)
+            .exclude(email=Lower(F('email')))
+            .order_by('pk')
+            .values_list('pk', 'email')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        with transaction.atomic(using=db):
+            lowered = {email.lower(): pk for pk, email in batch}
+            if (len(lowered) < len(batch)
+                    or users.filter(email__in=list(lowered)).exists()):
+                # Written since the check
+                check_conflicts(users)
+            users.bulk_update(
+                [User(pk=pk, email=email) for email, pk in lowered.items()],
+                ['email'])
+
+
+def drop_email_search_index(apps, schema_editor):
+    # Prefix searches on the lowercase emails use the varchar_pattern_ops
+    # index of the unique constraint instead
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX CONCURRENTLY IF EXISTS core_user_email_upper_prefix')
+
+
+def create_email_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS core_user_email_upper_prefix '
+        'ON core_user (UPPER(email::text) text_pattern_ops)')
+
+
+class Migration(migrations.Migration):
+
+    # Every batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('core', '0004_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.RunPython(
+            drop_email_search_index, create_email_search_index),
+    ]
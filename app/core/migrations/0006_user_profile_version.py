@@ -0,0 +1,81 @@
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+# Adding a column with a default rewrites the whole user table under an
+# ACCESS EXCLUSIVE lock before PostgreSQL 11, so the columns are added
+# nullable, get their default on the database side (for the rows the
+# running code inserts meanwhile) and the existing rows are filled in
+# batches; 0007 makes them NOT NULL
+DEFAULTS = [
+    ('profile_version', '1'),
+    ('profile_modified_at', 'now()'),
+]
+
+
+def set_database_defaults(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column, default in DEFAULTS:
+        schema_editor.execute(
+            'ALTER TABLE core_user ALTER COLUMN %s SET DEFAULT %s'
+            % (column, default))
+
+
+def drop_database_defaults(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column, _ in DEFAULTS:
+        schema_editor.execute(
+            'ALTER TABLE core_user ALTER COLUMN %s DROP DEFAULT' % column)
+
+
+def fill_profile_versions(apps, schema_editor):
+    # One short transaction per batch, walking the table by id so that
+    # each batch resumes where the previous one stopped
+    User = apps.get_model('core', 'User')
+    db = schema_editor.connection.alias
+    users = User.objects.using(db)
+    now = timezone.now()
+    last_id = 0
+    while True:
+        batch = list(
+            users.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1]
+
+        with transaction.atomic(using=db):
+            users.filter(pk__in=batch, profile_version__isnull=True).update(
+                profile_version=1)
+            users.filter(
+                pk__in=batch, profile_modified_at__isnull=True).update(
+                profile_modified_at=now)
+
+
+class Migration(migrations.Migration):
+
+    # Every batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_lowercase_emails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_modified_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_version',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.RunPython(set_database_defaults, drop_database_defaults),
+        migrations.RunPython(fill_profile_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def set_database_defaults(apps, schema_editor):
+    # AlterField drops the defaults 0006 set on the database side, the
+    # running code still inserts users without these columns
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE core_user '
+        'ALTER COLUMN profile_version SET DEFAULT 1, '
+        'ALTER COLUMN profile_modified_at SET DEFAULT now()')
+
+
+class Migration(migrations.Migration):
+
+    # 0006 filled every row: the UPDATE of AlterField finds nothing to
+    # write and SET NOT NULL only scans the table, in the same transaction
+    # as the defaults
+    dependencies = [
+        ('core', '0006_user_profile_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='profile_modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(
+            set_database_defaults, migrations.RunPython.noop),
+    ]
@@ -1,22 +1,144 @@
-from django.db import models
+import binascii
+import datetime
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.expressions import Combinable
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser, 
     BaseUserManager,
     PermissionsMixin
     )
 
+from core import hashing
+from core.db.utils import savepoint_if_atomic
+
 
 class UserManager(BaseUserManager):
+    @classmethod
+    def normalize_email(cls, email):
+        # Emails are stored fully lowercased (not only the domain), so that
+        # case variants of an address are the same account and every lookup
+        # is a plain probe of the unique index, see
+        # migrations/0005_lowercase_emails.py for the existing rows
+        return super().normalize_email(email).lower()
+
+    def get_by_natural_key(self, email):
+        # Used by authenticate(), whatever the case the email is typed in
+        return self.get(**{
+            self.model.USERNAME_FIELD: self.normalize_email(email)})
+
     def create_user(self, email, password=None, **extra_fields):
         # Creates and saves a new user
         if not email:
             raise ValueError('Users must have an email address!')
         user = self.model(email=self.normalize_email(email), **extra_fields)
-        user.set_password(password)
-        user.save(using=self._db)
+        # Hashing runs on the process pool, see core.hashing
+        hashing.set_password(user, password)
+        self._insert(user)
 
         return user
 
+    def _insert(self, user):
+        # No query for the email beforehand, a taken one raises IntegrityError
+        # from the unique constraint (see UserSerializer.create)
+        using = self._db or router.db_for_write(self.model)
+        with savepoint_if_atomic(using):
+            user.save(using=using)
+
+    async def acreate_user(self, email, password=None, **extra_fields):
+        # Coroutine version of create_user for the async views: the hash is
+        # awaited and the INSERT runs in a thread
+        if not email:
+            raise ValueError('Users must have an email address!')
+        user = self.model(email=self.normalize_email(email), **extra_fields)
+        await hashing.aset_password(user, password)
+        await sync_to_async(self._insert)(user)
+
+        return user
+
+    def bulk_create_users(self, users, batch_size=None, pool=None):
+        # Creates many users from dicts of fields (including the raw password)
+        # Passwords are hashed in parallel on the hashing pool and rows are
+        # inserted with bulk_create, batch_size rows per INSERT
+        # Returns the created users and a {position: errors} dict for the
+        # rows that could not be created, which do not abort the others
+        batch_size = batch_size or settings.USER_BULK_CREATE_BATCH_SIZE
+        duplicate_error = {'email': [self.unique_email_message()]}
+        errors = {}
+        pending = []
+        seen = set()
+        for position, fields in enumerate(users):
+            fields = dict(fields)
+            email = fields.pop('email', None)
+            password = fields.pop('password', None)
+            if not email:
+                errors[position] = {
+                    'email': ['Users must have an email address!']}
+                continue
+            user = self.model(email=self.normalize_email(email), **fields)
+            if user.email in seen:
+                errors[position] = duplicate_error
+                continue
+            seen.add(user.email)
+            pending.append((position, user, password))
+
+        # Every query on the primary: a transaction opened on the read alias
+        # (a replica with core.db.routers) would not cover the INSERTs, and
+        # a lagging replica misses emails taken a moment ago
+        using = self._db or router.db_for_write(self.model)
+
+        # Emails already taken, found with one IN query per batch instead of
+        # one EXISTS per row, and before any password gets hashed
+        existing = set()
+        for start in range(0, len(pending), batch_size):
+            existing.update(self.using(using).filter(email__in=[
+                user.email for _, user, _ in pending[start:start + batch_size]
+            ]).values_list('email', flat=True))
+        for position, user, _ in pending:
+            if user.email in existing:
+                errors[position] = duplicate_error
+        pending = [row for row in pending if row[1].email not in existing]
+
+        hashed = hashing.make_passwords(
+            [password for _, _, password in pending], pool=pool)
+        for (_, user, _), encoded in zip(pending, hashed):
+            user.password = encoded
+
+        created = []
+        with transaction.atomic(using=using):
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                try:
+                    with transaction.atomic(using=using):
+                        self.using(using).bulk_create(
+                            [user for _, user, _ in chunk])
+                    created.extend(user for _, user, _ in chunk)
+                except IntegrityError:
+                    # Some rows collided with existing users, insert this
+                    # chunk row by row to find out which ones
+                    for position, user, _ in chunk:
+                        try:
+                            with transaction.atomic(using=using):
+                                user.save(using=using, force_insert=True)
+                        except IntegrityError:
+                            errors[position] = duplicate_error
+                        else:
+                            created.append(user)
+
+        return created, errors
+
+    def unique_email_message(self):
+        # Same message as the unique validator generated by DRF
+        field = self.model._meta.get_field('email')
+        return field.error_messages['unique'] % {
+            'model_name': self.model._meta.verbose_name,
+            'field_label': field.verbose_name,
+        }
+
     def create_superuser(self, email, password):
         user = self.create_user(email, password)
         user.is_staff = True
@@ -32,7 +154,129 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Identify the current state of the profile returned by
+    # /api/user/currentuser/ (ETag and Last-Modified, see
+    # user.profile_cache), moved on by bump_profile_version()
+    profile_version = models.PositiveIntegerField(default=1)
+    profile_modified_at = models.DateTimeField(default=timezone.now)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
+
+    def clean(self):
+        # Run by model forms (e.g. the admin) before the unique check
+        super().clean()
+        self.email = self.__class__.objects.normalize_email(self.email)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if isinstance(self.profile_version, Combinable):
+            # Bumped, read the version the UPDATE wrote
+            self.refresh_from_db(fields=['profile_version'])
+
+    def bump_profile_version(self, now=None):
+        # To call before saving an edit of the profile fields, so that
+        # clients and the body cache stop using the previous representation
+        # Incremented by the UPDATE itself, two concurrent edits never end
+        # up with the same version
+        self.profile_version = models.F('profile_version') + 1
+        self.profile_modified_at = now or timezone.now()
+
+
+class AuthTokenManager(models.Manager):
+
+    def issue(self, user, now=None):
+        # New token valid for AUTH_TOKEN['TTL'] seconds
+        now = now or timezone.now()
+        return self.create(
+            raw_key=os.urandom(20),
+            user=user,
+            created_at=now,
+            expires_at=now + datetime.timedelta(
+                seconds=settings.AUTH_TOKEN['TTL']),
+        )
+
+    def rotate(self, token):
+        # Issues a replacement for token, which keeps working for
+        # AUTH_TOKEN['ROTATION_GRACE'] seconds so that requests in flight
+        # with it do not fail
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            new_token = self.issue(token.user, now)
+            grace_end = now + datetime.timedelta(
+                seconds=settings.AUTH_TOKEN['ROTATION_GRACE'])
+            if token.expires_at > grace_end:
+                token.expires_at = grace_end
+                token.save(update_fields=['expires_at'])
+        return new_token
+
+    def get_or_rotate(self, user):
+        # Token handed out on login: the newest valid token of the user,
+        # rotated once it is older than AUTH_TOKEN['ROTATE_AFTER'] seconds
+        now = timezone.now()
+        token = self.filter(
+            user=user, expires_at__gt=now).order_by('-created_at').first()
+        if token is None:
+            return self.issue(user, now)
+        token.user = user
+        rotate_after = datetime.timedelta(
+            seconds=settings.AUTH_TOKEN['ROTATE_AFTER'])
+        if token.created_at <= now - rotate_after:
+            return self.rotate(token)
+        return token
+
+    def lookup(self, key):
+        # Token (with its user) for the hex key sent by clients
+        try:
+            raw_key = binascii.unhexlify(key)
+        except (binascii.Error, ValueError):
+            raise self.model.DoesNotExist()
+        return self.select_related('user').get(raw_key=raw_key)
+
+    def keys_for_user(self, user_id):
+        return [
+            bytes(raw_key).hex() for raw_key in self.filter(
+                user_id=user_id).values_list('raw_key', flat=True)
+        ]
+
+
+class AuthToken(models.Model):
+    # Expiring API token, replaces rest_framework.authtoken.Token
+    # The key is stored as its 20 random bytes instead of 40 hex characters,
+    # which halves the unique index that every lookup walks, so that more
+    # of it stays in memory as the table grows
+    # expires_at is indexed for purge_expired_tokens, (user, created_at) for
+    # the per user lookups done on login and on cache invalidation
+    raw_key = models.BinaryField(max_length=20, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='auth_tokens',
+        on_delete=models.CASCADE,
+        # Covered by the (user, created_at) index
+        db_index=False,
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    # Written in batches by core.tokens, may lag behind by a minute or so
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    objects = AuthTokenManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at'],
+                name='core_authtoken_user_created'),
+        ]
+
+    @property
+    def key(self):
+        # The hex string clients send in "Authorization: Token <key>"
+        return bytes(self.raw_key).hex()
+
+    def is_expired(self, now=None):
+        return self.expires_at <= (now or timezone.now())
+
+    def __str__(self):
+        return '%s... (%s)' % (self.key[:8], self.user_id)
@@ -0,0 +1,20 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FastContentNegotiation(DefaultContentNegotiation):
+    # Returns the first renderer straight away when the client accepts
+    # anything or exactly its media type, which is what API clients send,
+    # instead of parsing and ordering the Accept header on every request
+    # Other requests (browsers, ?format=, media type parameters) go through
+    # the full negotiation
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query_param = self.settings.URL_FORMAT_OVERRIDE
+        if not format_suffix and not (
+                format_query_param
+                and format_query_param in request.query_params):
+            renderer = renderers[0]
+            accept = request.META.get('HTTP_ACCEPT', '*/*')
+            if accept == '*/*' or accept == renderer.media_type:
+                return renderer, renderer.media_type
+        return super().select_renderer(request, renderers, format_suffix)
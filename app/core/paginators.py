@@ -0,0 +1,50 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    # Paginator that takes the row count from the PostgreSQL planner instead
+    # of running SELECT COUNT(*), which reads the whole table (or index)
+    # The planner estimate comes from the statistics kept up to date by
+    # (auto)vacuum/analyze, so it can be off by a few percent; results
+    # estimated below `exact_below` rows are counted exactly, that is cheap
+    # and keeps small result sets (e.g. searches) accurate
+    # Other databases always get the exact count
+
+    exact_below = 10000
+
+    def __init__(self, *args, exact_below=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if exact_below is not None:
+            self.exact_below = exact_below
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is None or estimate < self.exact_below:
+            return super().count
+        self.estimated = True
+        return estimate
+
+    def estimate(self):
+        # Rows the planner expects the query to return, None when unknown
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
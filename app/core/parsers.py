@@ -0,0 +1,33 @@
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import json
+
+from core.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(parsers.JSONParser):
+    # JSONParser decoding the whole body at once, with orjson when it is
+    # installed, instead of through a codecs stream reader
+    # Bodies are small JSON documents, which the stock parser spends more
+    # time wrapping than decoding
+
+    renderer_class = FastJSONRenderer
+    use_orjson = orjson is not None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+
+        try:
+            # orjson only reads UTF-8, and rejects NaN/Infinity like
+            # STRICT_JSON does
+            if (self.use_orjson and self.strict
+                    and encoding.lower().replace('-', '') == 'utf8'):
+                return orjson.loads(body)
+            parse_constant = json.strict_constant if self.strict else None
+            return json.loads(
+                body.decode(encoding), parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
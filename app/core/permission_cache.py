@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+# Cross-request cache of the permissions of each user, read by
+# core.backends.PooledModelBackend
+# ModelBackend only keeps them on the user instance, i.e. for one request,
+# and queries the user and the group permissions again for the next one,
+# while the admin checks permissions on every page
+# Entries hold the two sets as frozensets of "app_label.codename" and are
+# keyed by user and by a global version: a change to the permissions or
+# groups of some users deletes their entries, a change to a group or to the
+# permissions themselves bumps the version, which orphans every entry
+# Disabled unless PERMISSION_CACHE['ALIAS'] is set: signals only reach the
+# cache of the process they are sent in, with a per-process cache (locmem)
+# other workers would see changes once their entries expire, after
+# PERMISSION_CACHE['TTL'] seconds
+
+VERSION_KEY = 'perms:version'
+
+
+def get_cache():
+    alias = settings.PERMISSION_CACHE['ALIAS']
+    return caches[alias] if alias else None
+
+
+def get_version(cache):
+    # Starts from the clock, so that a version evicted from the cache does
+    # not come back with a value older entries were stored under
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def entry_key(cache, user_pk):
+    return 'perms:%s:%s' % (get_version(cache), user_pk)
+
+
+def get(user_pk):
+    # (user permissions, group permissions) of a user, None on a miss
+    cache = get_cache()
+    if cache is None:
+        return None
+    return cache.get(entry_key(cache, user_pk))
+
+
+def store(user_pk, user_perms, group_perms):
+    cache = get_cache()
+    if cache is not None:
+        cache.set(
+            entry_key(cache, user_pk),
+            (frozenset(user_perms), frozenset(group_perms)),
+            settings.PERMISSION_CACHE['TTL'])
+
+
+def invalidate(user_pks):
+    cache = get_cache()
+    if cache is not None:
+        cache.delete_many([entry_key(cache, pk) for pk in user_pks])
+
+
+def bump_version():
+    cache = get_cache()
+    if cache is not None:
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            # Evicted, a new one is taken from the clock
+            get_version(cache)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user(sender, instance, created, **kwargs):
+    # is_active and is_superuser change the permissions, a new user may
+    # reuse the primary key of a deleted one
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate([instance.pk])
+
+
+@receiver(post_delete, sender=get_user_model())
+def invalidate_deleted_user(sender, instance, **kwargs):
+    invalidate([instance.pk])
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+def invalidate_members(sender, instance, action, reverse, pk_set, **kwargs):
+    # user.groups and user.user_permissions changes, from either side
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate([instance.pk])
+    elif pk_set:
+        invalidate(pk_set)
+    else:
+        # group.user_set.clear(), the users are not known anymore
+        bump_version()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_all(sender, **kwargs):
+    # Deleting a group or a permission removes their links without
+    # m2m_changed, and superusers have every permission
+    bump_version()
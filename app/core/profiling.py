@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = metrics.Histogram(
+    'app_request_duration_seconds', 'Wall time spent in the view.')
+DB_QUERIES = metrics.Histogram(
+    'app_db_queries', 'Database queries per request.', metrics.COUNT_BUCKETS)
+DB_DURATION = metrics.Histogram(
+    'app_db_duration_seconds', 'Time spent running queries per request.')
+SECTION_DURATION = metrics.Histogram(
+    'app_section_duration_seconds',
+    'Time spent per request in a profiled section (serializer, '
+    'password_hash...), excluding nested sections.')
+N_PLUS_ONE = metrics.Counter(
+    'app_n_plus_one_total',
+    'Requests running the same query PROFILING_N_PLUS_ONE_THRESHOLD '
+    'times or more.')
+
+# Profile of the current request, a context variable rather than a
+# thread local so that it follows requests served by async views
+_current = contextvars.ContextVar('profile', default=None)
+
+
+class _Profile:
+
+    def __init__(self):
+        self.queries = {}
+        self.query_count = 0
+        self.query_time = 0.0
+        self.sections = {}
+        # [name, started at, time spent in nested sections]
+        self.stack = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - started
+            self.query_count += 1
+            self.queries[sql] = self.queries.get(sql, 0) + 1
+
+
+class _Section:
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.stack.append([self.name, time.perf_counter(), 0.0])
+
+    def __exit__(self, *exc_info):
+        name, started, nested = self.profile.stack.pop()
+        elapsed = time.perf_counter() - started
+        sections = self.profile.sections
+        sections[name] = sections.get(name, 0.0) + elapsed - nested
+        if self.profile.stack:
+            self.profile.stack[-1][2] += elapsed
+
+
+class _NoopSection:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_noop = _NoopSection()
+
+
+def _record(execute, sql, params, many, context):
+    # Execute wrapper installed once on every connection, which records the
+    # query in the profile of the request running it (if any): under ASGI
+    # the queries of a request run in threads other than the one its
+    # middleware runs in, and a thread runs the queries of many requests
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def _install(connection):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def _install_on_created(sender, connection, **kwargs):
+    _install(connection)
+
+
+def section(name):
+    # Context manager timing a block of code for the current request
+    # Costs one context variable lookup when the request is not profiled
+    profile = _current.get()
+    if profile is None:
+        return _noop
+    return _Section(profile, name)
+
+
+class ProfilingMiddleware:
+    # Records per view wall time, query count and time, and the time spent
+    # in profiled sections, exposed on /api/metrics/
+    # Removed from the middleware chain unless PROFILING_ENABLED is set
+    # Sync and async capable: under ASGI, a sync only middleware would run
+    # every request of the worker through Django's single sync thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Tells Django's handler to await it, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        # Connections are per thread, those of the threads serving requests
+        # are mostly opened later
+        connection_created.connect(_install_on_created)
+        for connection in connections.all():
+            _install(connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        # Connections of this thread opened before the middleware was loaded
+        for connection in connections.all():
+            _install(connection)
+        profile = _Profile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, profile, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        profile = _Profile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, profile, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, profile, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        REQUEST_DURATION.observe(elapsed, view=view)
+        DB_QUERIES.observe(profile.query_count, view=view)
+        DB_DURATION.observe(profile.query_time, view=view)
+        for name, spent in profile.sections.items():
+            SECTION_DURATION.observe(spent, view=view, section=name)
+
+        threshold = settings.PROFILING_N_PLUS_ONE_THRESHOLD
+        repeated = {
+            sql: count for sql, count in profile.queries.items()
+            if count >= threshold
+        }
+        if repeated:
+            N_PLUS_ONE.inc(view=view)
+            for sql, count in repeated.items():
+                logger.warning(
+                    'Possible N+1 in %s: query ran %d times: %s',
+                    view, count, sql)
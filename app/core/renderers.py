@@ -0,0 +1,42 @@
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    # Optional, the renderer falls back to the json module of DRF
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    # JSONRenderer serializing with orjson when it is installed
+    # Same output as the stock renderer for compact unicode JSON (the DRF
+    # defaults): types orjson does not handle natively, and datetimes so that
+    # they keep the DRF format, go through the DRF encoder
+    # Pretty printing (Accept: application/json; indent=4) and non default
+    # COMPACT_JSON/UNICODE_JSON settings use the stock code path
+
+    use_orjson = orjson is not None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (not self.use_orjson or data is None
+                or not self.compact or self.ensure_ascii):
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=encoders.JSONEncoder().default,
+            option=(
+                orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS
+            ),
+        )
+        # Escaped like the stock renderer, so that the output stays a strict
+        # javascript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,119 @@
+import collections
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer
+from drf_spectacular.settings import spectacular_settings
+
+logger = logging.getLogger(__name__)
+
+# body as sent (gzipped or not), its strong ETag and the Content-Type header
+Rendering = collections.namedtuple(
+    'Rendering', ['body', 'etag', 'content_type'])
+
+
+def generate():
+    # Introspects every view and serializer, the work SpectacularAPIView
+    # does on every request
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        urlconf=spectacular_settings.SERVE_URLCONF)
+    return generator.get_schema(request=None, public=True)
+
+
+def render_json(schema):
+    # Same bytes as /api/schema/?format=json, used for the artifact
+    return OpenApiJsonRenderer().render(schema, renderer_context={})
+
+
+class SchemaDocument:
+    # The OpenAPI schema of the API and its renderings, built once per
+    # process: the schema only changes with the code, i.e. on deploy
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._renderings = {}
+        self._lock = threading.Lock()
+
+    def rendering(self, renderer, compressed=False):
+        key = (type(renderer), compressed)
+        rendering = self._renderings.get(key)
+        if rendering is None:
+            with self._lock:
+                rendering = self._renderings.get(key)
+                if rendering is None:
+                    rendering = self._render(renderer, compressed)
+                    self._renderings[key] = rendering
+        return rendering
+
+    def _render(self, renderer, compressed):
+        body = renderer.render(self.schema, renderer.media_type, {})
+        if isinstance(body, str):
+            body = body.encode(renderer.charset or 'utf-8')
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += '; charset=%s' % renderer.charset
+        # Different bytes, different strong ETag (RFC 7232 2.3.3)
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        if compressed:
+            body = gzip.compress(body, mtime=0)
+            etag += '-gzip'
+        return Rendering(body, '"%s"' % etag, content_type)
+
+
+_document = None
+_document_lock = threading.Lock()
+
+
+def load():
+    # The artifact written by generate_schema when API_SCHEMA_FILE points to
+    # one, the live schema otherwise
+    path = settings.API_SCHEMA_FILE
+    if path:
+        try:
+            with open(path, 'rb') as artifact:
+                return json.load(artifact)
+        except FileNotFoundError:
+            logger.warning(
+                'API schema artifact %s not found, generating the schema',
+                path)
+        except ValueError:
+            # Truncated or not JSON, e.g. a build step that failed halfway
+            logger.exception(
+                'API schema artifact %s is corrupt, generating the schema',
+                path)
+    return generate()
+
+
+def get_document():
+    global _document
+    if _document is None:
+        with _document_lock:
+            if _document is None:
+                _document = SchemaDocument(load())
+    return _document
+
+
+def reset():
+    # Next get_document() builds the schema again
+    global _document
+    with _document_lock:
+        _document = None
+
+
+def write_artifact(path):
+    # Generates the schema and writes it to path, replacing the previous
+    # file atomically so that a starting worker never reads half of it
+    # Returns the version of the artifact, the start of its sha256
+    body = render_json(generate())
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    with open(temporary, 'wb') as artifact:
+        artifact.write(body)
+    os.replace(temporary, path)
+    return hashlib.sha256(body).hexdigest()[:12]
@@ -0,0 +1,53 @@
+import re
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers)
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from rest_framework.response import Response
+
+from core import schema
+
+# Kept apart from core.views: drf_spectacular is only imported once the
+# documentation is requested (see app/urls.py)
+
+# Same test as django.middleware.gzip.GZipMiddleware
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class CachedSchemaView(SpectacularAPIView):
+    # SpectacularAPIView serving the schema built once per process (see
+    # core.schema) instead of introspecting every view on each request
+    # Answers If-None-Match with a 304, and sends the pre-compressed body
+    # to clients accepting gzip
+    # Translated (?lang=) schemas still go through the generator
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if settings.USE_I18N and request.GET.get('lang'):
+            return super().get(request, *args, **kwargs)
+
+        document = schema.get_document()
+        renderer = request.accepted_renderer
+        if request.accepted_media_type != renderer.media_type:
+            # Media type parameters, e.g. an indent, rendered per request
+            return Response(document.schema)
+
+        compressed = bool(ACCEPTS_GZIP.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        rendering = document.rendering(renderer, compressed)
+        response = get_conditional_response(
+            request._request, etag=rendering.etag)
+        if response is None:
+            response = HttpResponse(
+                rendering.body, content_type=rendering.content_type)
+            if compressed:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = rendering.etag
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        # Revalidated every time, which costs a 304
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
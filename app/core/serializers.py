@@ -0,0 +1,110 @@
+import copy
+
+from rest_framework import fields, relations, serializers
+
+# Fields holding other bound fields, which need a deep copy per serializer
+_NESTED_FIELDS = (
+    serializers.BaseSerializer,
+    fields.ListField,
+    fields.DictField,
+    relations.ManyRelatedField,
+)
+
+
+def _copy_field(field):
+    # Binding a field only sets attributes on it, so a shallow copy of an
+    # unbound prototype is enough for plain fields
+    if isinstance(field, _NESTED_FIELDS):
+        return copy.deepcopy(field)
+    return copy.copy(field)
+
+
+class CachedFieldsMixin:
+    # Builds the fields of a serializer class once instead of on every
+    # instantiation: ModelSerializer.get_fields() introspects the model and
+    # Meta.extra_kwargs, and Serializer.get_fields() deep copies every
+    # declared field, each time a serializer is created
+    # Instances get copies of the cached prototypes, so this only suits
+    # serializers whose fields do not depend on the instance or the context
+    # cache_fields = False restores the stock behaviour
+
+    cache_fields = True
+
+    def get_fields(self):
+        if not self.cache_fields:
+            return super().get_fields()
+        prototypes = type(self).prime_fields()
+        return {name: _copy_field(field) for name, field in prototypes.items()}
+
+    @classmethod
+    def prime_fields(cls):
+        # Builds (once) and returns the field prototypes of this class
+        prototypes = cls.__dict__.get('_field_prototypes')
+        if prototypes is None:
+            # Unbound instance, only used to run the stock get_fields()
+            prototypes = super(CachedFieldsMixin, cls()).get_fields()
+            cls._field_prototypes = prototypes
+        return prototypes
+
+    @classmethod
+    def represent(cls, instance, context=None):
+        # Same output as cls(instance).data for model serializers whose
+        # readable fields are all plain (non relational) model fields, read
+        # straight from the instance without building a serializer
+        # Other serializers go through the full field machinery
+        plan = cls._representation_plan()
+        if plan is None:
+            return cls(instance, context=context or {}).data
+        ret = {}
+        for name, attname, to_representation in plan:
+            value = getattr(instance, attname)
+            ret[name] = None if value is None else to_representation(value)
+        return ret
+
+    @classmethod
+    def _representation_plan(cls):
+        # [(output name, model attribute, to_representation)], or None when
+        # represent() cannot take the shortcut
+        if '_represent_plan' in cls.__dict__:
+            return cls._represent_plan
+
+        plan = []
+        model = getattr(getattr(cls, 'Meta', None), 'model', None)
+        if model is None:
+            cls._represent_plan = None
+            return None
+        model_fields = {
+            field.name: field.attname
+            for field in model._meta.concrete_fields
+            if not field.is_relation
+        }
+        serializer = cls()
+        for field in serializer._readable_fields:
+            if (isinstance(field, _NESTED_FIELDS)
+                    or isinstance(field, (relations.RelatedField,
+                                          fields.SerializerMethodField))
+                    or len(field.source_attrs) != 1
+                    or field.source_attrs[0] not in model_fields):
+                plan = None
+                break
+            if (type(field).to_representation
+                    is fields.CharField.to_representation):
+                # CharField, EmailField... only call str()
+                to_representation = str
+            else:
+                to_representation = field.to_representation
+            plan.append((
+                field.field_name,
+                model_fields[field.source_attrs[0]],
+                to_representation,
+            ))
+        cls._represent_plan = plan
+        return plan
+
+
+class CachedSerializer(CachedFieldsMixin, serializers.Serializer):
+    pass
+
+
+class CachedModelSerializer(CachedFieldsMixin, serializers.ModelSerializer):
+    pass
@@ -0,0 +1,61 @@
+import math
+import os
+
+# Sizing of the production server, see gunicorn.conf.py
+# Plain functions without Django imports: gunicorn reads its configuration
+# before the application is loaded
+
+CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_CPU_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_CPU_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+
+def _read(path):
+    try:
+        with open(path) as source:
+            return source.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit():
+    # CPUs allowed by the container CPU quota (docker --cpus), None if
+    # unlimited
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+    quota, period = _read(CGROUP_V1_CPU_QUOTA), _read(CGROUP_V1_CPU_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def cpu_count():
+    # CPUs this process may actually use: os.cpu_count() reports the host,
+    # not the affinity mask or the quota of the container
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit:
+        count = min(count, max(1, math.ceil(limit)))
+    return count
+
+
+def worker_count(cpus, maximum=16):
+    # The usual 2 x CPUs + 1: while a worker waits on the database or the
+    # hashing pool another one can use the CPU
+    return max(2, min(2 * cpus + 1, maximum))
+
+
+def hashing_workers(cpus, workers):
+    # Hashing processes per server worker: the CPUs shared among the
+    # hashing pools (one per worker) rather than one process per CPU in
+    # each pool, rounded up so that no CPU is left without one
+    # With the default worker_count() there are more workers than CPUs, i.e.
+    # one process per worker; more only with fewer workers (WEB_CONCURRENCY)
+    return max(1, math.ceil(cpus / workers))
@@ -0,0 +1,106 @@
+import collections
+import json
+import os
+import subprocess
+import sys
+
+# Measures how long a worker takes to start, see the startup_report command
+# Runs in a fresh interpreter: in the calling process everything is already
+# imported
+
+ImportTime = collections.namedtuple(
+    'ImportTime', ('module', 'self_ms', 'cumulative_ms', 'depth'))
+
+# Goes through what a WSGI worker does before serving its first request,
+# timing each phase
+PROBE = '''
+import json
+import sys
+import time
+
+phases = []
+start = time.perf_counter()
+
+
+def mark(phase):
+    global start
+    now = time.perf_counter()
+    phases.append((phase, (now - start) * 1000))
+    start = now
+
+
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings')
+import django
+django.setup(set_prefix=False)
+mark('apps')
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+mark('middleware')
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('urls')
+sys.stdout.write(json.dumps(phases))
+'''
+
+
+class ProbeError(Exception):
+    pass
+
+
+def probe(settings_module, importtime=False, cwd=None):
+    # Returns the [(phase, ms)] of a fresh start and, with importtime, the
+    # stderr of python -X importtime
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    result = subprocess.run(
+        command + ['-c', PROBE],
+        cwd=cwd,
+        env=dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if result.returncode:
+        raise ProbeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout), result.stderr
+
+
+def parse_importtime(output):
+    # Lines like "import time:       512 |       2048 |   django.urls",
+    # nested imports indented by two more spaces
+    # Modules loaded with importlib.import_module (settings, apps, URLconfs)
+    # are not listed, what they import shows up at the top level
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append(ImportTime(
+            name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000,
+            depth))
+    return imports
+
+
+def by_package(imports):
+    # Import time spent in the modules of each top level package, largest
+    # first
+    totals = collections.Counter()
+    for module in imports:
+        totals[module.module.partition('.')[0]] += module.self_ms
+    return totals.most_common()
+
+
+def report(settings_module, runs=5, cwd=None):
+    # Best time of each phase over `runs` starts, and the modules imported
+    # by one more start under -X importtime (which slows it down)
+    best = {}
+    for _ in range(runs):
+        phases, _ = probe(settings_module, cwd=cwd)
+        for phase, ms in phases:
+            best[phase] = min(ms, best.get(phase, ms))
+    _, output = probe(settings_module, importtime=True, cwd=cwd)
+    return best, parse_importtime(output)
@@ -0,0 +1,95 @@
+import datetime
+import inspect
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import activity
+
+TOKEN_URL = reverse('user:token')
+
+
+class LastLoginBufferTests(TestCase):
+    # Test the deferred last_login updates
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.users = [
+            get_user_model().objects.create_user(
+                email='test%d@gmail.com' % i,
+                password='test123',
+                name='Test'
+            )
+            for i in range(3)
+        ]
+        activity.last_login.clear()
+        # Restart the flush interval, so that no request flushes in a test
+        activity.last_login.flush()
+
+    def tearDown(self) -> None:
+        activity.last_login.clear()
+
+    def test_token_login_is_buffered(self):
+        # Test that logging in does not write the user row
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        res = APIClient().post(
+            TOKEN_URL, {'email': 'test0@gmail.com', 'password': 'test123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        user = self.users[0]
+        user.refresh_from_db()
+        self.assertIsNone(user.last_login)
+        self.assertIsNotNone(activity.pending_last_login(user.pk))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_flush_single_statement(self):
+        # Test that one flush updates every pending user at once
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        now = timezone.now()
+        for i, user in enumerate(self.users):
+            activity.record_login(
+                user, now - datetime.timedelta(minutes=i))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(activity.last_login.flush(), 3)
+
+        for i, user in enumerate(self.users):
+            user.refresh_from_db()
+            self.assertEqual(
+                user.last_login, now - datetime.timedelta(minutes=i))
+        self.assertIsNone(activity.pending_last_login(self.users[0].pk))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_session_login_is_buffered(self):
+        # Test that the admin login goes through the buffer, and that the
+        # pending value shows up in the admin
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+        client = Client()
+        self.assertTrue(
+            client.login(username='admin@gmail.com', password='123456'))
+        admin_user.refresh_from_db()
+        self.assertIsNone(admin_user.last_login)
+
+        res = client.get(
+            reverse('admin:core_user_change', args=[admin_user.id]))
+        self.assertContains(res, 'Last login (not saved yet)')
+        self.assertNotContains(res, 'Nothing pending in this process')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
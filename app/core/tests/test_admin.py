@@ -1,9 +1,13 @@
 import inspect
+from unittest.mock import patch
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.management.base import BaseCommand
 
+from core.admin import UserAdmin
+from core.paginators import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
     # Create a setup function that runs before any tests do
@@ -64,3 +68,63 @@ class AdminSiteTests(TestCase):
         self.assertEqual(res.status_code, 200)
 
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_keyset_pages(self):
+        # Test paging through users with after_id instead of page numbers
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        users = [self.admin_user, self.user] + [
+            get_user_model().objects.create_user(
+                email='user%d@gmail.com' % i, password='123456', name='User')
+            for i in range(3)
+        ]
+        url = reverse('admin:core_user_changelist')
+        with patch.object(UserAdmin, 'list_per_page', 2):
+            res = self.client.get(url)
+            cl = res.context['cl']
+            self.assertEqual(list(cl.result_list), users[:2])
+            self.assertEqual(cl.next_after_id, users[1].id)
+            self.assertContains(res, cl.next_page_url.replace('&', '&amp;'))
+
+            res = self.client.get(url, {'after_id': users[3].id})
+            cl = res.context['cl']
+            self.assertEqual(list(cl.result_list), users[4:])
+            self.assertIsNone(cl.next_page_url)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_prefix_search(self):
+        # Test that the search only matches the start of emails and names
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        url = reverse('admin:core_user_changelist')
+        res = self.client.get(url, {'q': 'TES'})
+        self.assertEqual(list(res.context['cl'].result_list), [self.user])
+
+        res = self.client.get(url, {'q': 'gmail'})
+        self.assertEqual(list(res.context['cl'].result_list), [])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_estimated_count(self):
+        # Test that large estimates replace the COUNT(*), small ones do not
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        queryset = get_user_model().objects.order_by('id')
+        with patch.object(
+                EstimatedCountPaginator, 'estimate', return_value=50000):
+            paginator = EstimatedCountPaginator(queryset, 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 50000)
+            self.assertTrue(paginator.estimated)
+
+        with patch.object(
+                EstimatedCountPaginator, 'estimate', return_value=10):
+            paginator = EstimatedCountPaginator(queryset, 100)
+            self.assertEqual(paginator.count, 2)
+            self.assertFalse(paginator.estimated)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -1,9 +1,14 @@
-from unittest.mock import patch
+import io
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
 # allow commands to be called
 from django.core.management import call_command
 from django.db.utils import OperationalError
 from django.test import TestCase
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
 import inspect
 
 
@@ -16,10 +21,13 @@ class CommandTests(TestCase):
             f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
         # Test waiting for db when db is available
         with patch('django.db.utils.ConnectionHandler.__getitem__') as getitem:
-            getitem.return_value = True
+            getitem.return_value = MagicMock()
             # In django convention, the call_command function search for custom commands in the directory call "management/commands"
-            call_command('wait_for_db')
+            call_command('wait_for_db', stdout=io.StringIO())
             self.assertEqual(getitem.call_count, 1)
+            # The probe must actually run a query
+            cursor = getitem.return_value.cursor.return_value.__enter__
+            cursor.return_value.execute.assert_called_once_with('SELECT 1')
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
 
     # The decorator avoids called sleep function (in the tested command) to reduce waiting time
@@ -31,8 +39,225 @@ class CommandTests(TestCase):
             f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
         # Test waiting for db
         with patch('django.db.utils.ConnectionHandler.__getitem__') as getitem:
-            getitem.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
+            getitem.side_effect = [OperationalError] * 5 + [MagicMock()]
+            call_command('wait_for_db', stdout=io.StringIO())
             self.assertEqual(getitem.call_count, 6)
+            # Delays between attempts grow exponentially, with jitter
+            delays = [call.args[0] for call in required_arg.call_args_list]
+            self.assertEqual(len(delays), 5)
+            for attempt, delay in enumerate(delays):
+                self.assertLessEqual(delay, 0.1 * 2 ** attempt)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, required_arg):
+
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test giving up once the timeout is reached
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as getitem:
+            getitem.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=io.StringIO())
+            self.assertEqual(getitem.call_count, 1)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class ImportUsersCommandTests(TestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_import_users_csv(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test importing users skips invalid rows and existing users
+        get_user_model().objects.create_user('taken@gmail.com', 'test123')
+        path = self.write_file('users.csv', '\n'.join([
+            'email,password,name',
+            'one@GMAIL.COM,test123,One',
+            'taken@gmail.com,test123,Taken',
+            ',test123,Nobody',
+            'two@gmail.com,test123,Two',
+        ]))
+
+        call_command('import_users', path, batch_size=2, stdout=io.StringIO())
+
+        user = get_user_model().objects.get(email='one@gmail.com')
+        self.assertEqual(user.name, 'One')
+        self.assertTrue(user.check_password('test123'))
+        self.assertTrue(
+            get_user_model().objects.filter(email='two@gmail.com').exists())
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_import_users_resume(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that rows before the checkpoint are not imported again
+        path = self.write_file('users.ndjson', '\n'.join(
+            json.dumps({
+                'email': 'user%d@gmail.com' % i, 'password': 'test123'})
+            for i in range(4)
+        ))
+        with open(path + '.checkpoint', 'w') as f:
+            json.dump({'rows': 2}, f)
+
+        call_command('import_users', path, stdout=io.StringIO())
+
+        self.assertEqual(
+            sorted(get_user_model().objects.values_list('email', flat=True)),
+            ['user2@gmail.com', 'user3@gmail.com']
+        )
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_import_users_rejected(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that unreadable NDJSON lines are reported and the import
+        # goes on
+        path = self.write_file('users.ndjson', '\n'.join([
+            json.dumps({'email': 'one@gmail.com', 'password': 'test123'}),
+            '{"email": "broken@gmail.com",',
+            '["list@gmail.com"]',
+            json.dumps({'email': 5}),
+            json.dumps({'email': 'pin@gmail.com', 'password': 12345678}),
+            json.dumps({'email': 'obj@gmail.com', 'name': {'first': 'A'}}),
+            json.dumps({'email': 'two@gmail.com', 'password': 'test123'}),
+        ]))
+        out, err = io.StringIO(), io.StringIO()
+
+        call_command(
+            'import_users', path, batch_size=2, stdout=out, stderr=err)
+
+        self.assertEqual(
+            sorted(get_user_model().objects.values_list('email', flat=True)),
+            ['one@gmail.com', 'two@gmail.com']
+        )
+        lines = err.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[0].startswith('Line 2 rejected: malformed JSON'))
+        self.assertEqual(lines[1:], [
+            'Line 3 rejected: not an object',
+            'Line 4 rejected: email is not a string',
+            'Line 5 rejected: password is not a string',
+            'Line 6 rejected: name is not a string',
+        ])
+        self.assertIn('5 rejected', out.getvalue())
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class ExportUsersCommandTests(TestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+
+    def test_export_users_csv(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that users spread over several keyset pages are all exported
+        users = [
+            get_user_model().objects.create_user(
+                'user%d@gmail.com' % i, 'test123', name='User %d' % i)
+            for i in range(5)
+        ]
+        out = io.StringIO()
+
+        call_command('export_users', page_size=2, stdout=out,
+                     stderr=io.StringIO())
+
+        self.assertEqual(out.getvalue().splitlines(), ['id,email,name'] + [
+            '%d,%s,%s' % (user.id, user.email, user.name) for user in users
+        ])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class BenchUserAPICommandTests(TestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+
+    def test_bench_user_api(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that every endpoint is measured and saved
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, 'bench.json')
+            call_command(
+                'bench_user_api', no_test_db=True, concurrency=1,
+                requests=3, users=2, warmup=0, output=output,
+                stdout=io.StringIO())
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(
+            sorted(report['results']), ['create', 'currentuser', 'token'])
+        for result in report['results'].values():
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(result['errors'], 0)
+            self.assertIn('p99', result['latency_ms'])
+            self.assertIsNotNone(result['queries_per_request'])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_bench_user_api_errors(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that bad options and a failed login stop the benchmark with
+        # a message
+        with self.assertRaisesMessage(CommandError, '--requests must be at least 1'):
+            call_command(
+                'bench_user_api', no_test_db=True, requests=0,
+                stdout=io.StringIO())
+
+        responses = [
+            (201, {'email': 'bench@example.com'}, None),
+            (429, {'detail': 'Request was throttled.'}, None),
+        ]
+        with patch(
+                'core.management.commands.bench_user_api.HttpTarget.request',
+                side_effect=responses):
+            with self.assertRaisesMessage(
+                    CommandError, "(HTTP 429): {'detail': 'Request was throttled.'}"):
+                call_command(
+                    'bench_user_api', base_url='http://localhost:8000',
+                    users=1, stdout=io.StringIO())
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class BenchSerializationCommandTests(TestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+
+    def test_bench_serialization(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that every case is measured against its baseline
+        out = io.StringIO()
+        call_command(
+            'bench_serialization', iterations=2, rows=3, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(any(
+            line.startswith('render 3 users') and ' stdlib ' in line
+            for line in lines))
+        self.assertTrue(any(
+            line.startswith('negotiate */*') and ' fast ' in line
+            for line in lines))
 
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
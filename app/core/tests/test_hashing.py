@@ -0,0 +1,71 @@
+import inspect
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import hashers, get_user_model
+from django.urls import reverse
+from django.core.management.base import BaseCommand
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import hashing
+
+
+class PasswordHashingPoolTests(TestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.pool = hashing.PasswordHashingPool(workers=2, max_pending=2)
+
+    def tearDown(self) -> None:
+        self.pool.shutdown()
+
+    def test_make_passwords(self):
+        # Test that hashes computed by the workers are valid
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        passwords = ['password%d' % i for i in range(5)]
+        hashed = hashing.make_passwords(passwords, pool=self.pool, chunk_size=2)
+
+        self.assertEqual(len(hashed), len(passwords))
+        for password, encoded in zip(passwords, hashed):
+            self.assertTrue(hashers.check_password(password, encoded))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_pool_saturated(self):
+        # Test that submitting beyond max_pending fails fast
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.pool._slots.acquire()
+        self.pool._slots.acquire()
+        with self.assertRaises(hashing.HashingPoolSaturated):
+            self.pool.run(hashing._make_password, 'test123')
+        self.pool._slots.release()
+        self.pool._slots.release()
+
+        self.assertTrue(hashers.check_password(
+            'test123', self.pool.run(hashing._make_password, 'test123')))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_token_endpoint_busy(self):
+        # Test that the token endpoint answers 503 when the pool is saturated
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        get_user_model().objects.create_user(
+            email='test@gmail.com', password='test123')
+        with patch('core.hashing.PasswordHashingPool.submit') as submit:
+            submit.side_effect = hashing.HashingPoolSaturated
+            res = APIClient().post(reverse('user:token'), {
+                'email': 'test@gmail.com',
+                'password': 'test123',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -1,7 +1,12 @@
+import importlib
 from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
 from sys import stdout
 from core import models
 
+from django.apps import apps
+from django.db import connection, router
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 import inspect
@@ -44,6 +49,76 @@ class ModelTests(TestCase):
 
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
 
+    def test_lowercase_emails_migration(self):
+        # Test the backfill of the emails stored before they were lowercased
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        migration = importlib.import_module(
+            'core.migrations.0005_lowercase_emails')
+        User = get_user_model()
+        rows = {}
+        for email in ('Mixed@gmail.com', 'Taken@gmail.com', 'taken@gmail.com'):
+            user = User.objects.create_user(email, 'randomcharacters')
+            # Written as they were before the full normalization
+            User.objects.filter(pk=user.pk).update(email=email)
+            rows[email] = user.pk
+
+        # Nothing is rewritten until the conflicting accounts are merged
+        with self.assertRaisesMessage(
+                RuntimeError, 'taken@gmail.com (users %d, %d)' % (
+                    rows['Taken@gmail.com'], rows['taken@gmail.com'])):
+            migration.lowercase_emails(
+                apps, SimpleNamespace(connection=connection))
+        self.assertTrue(User.objects.filter(email='Mixed@gmail.com').exists())
+
+        User.objects.filter(pk=rows['Taken@gmail.com']).delete()
+        migration.lowercase_emails(
+            apps, SimpleNamespace(connection=connection))
+
+        emails = dict(User.objects.values_list('pk', 'email'))
+        self.assertEqual(emails[rows['Mixed@gmail.com']], 'mixed@gmail.com')
+        self.assertEqual(emails[rows['taken@gmail.com']], 'taken@gmail.com')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_bump_profile_version(self):
+        # Test that concurrent edits of the profile each get a new version
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        user = get_user_model().objects.create_user(
+            'test@gmail.com', 'randomcharacters')
+        first = get_user_model().objects.get(pk=user.pk)
+        second = get_user_model().objects.get(pk=user.pk)
+        for edit in (first, second):
+            edit.bump_profile_version()
+            edit.save()
+
+        self.assertEqual((first.profile_version, second.profile_version), (2, 3))
+        user.refresh_from_db()
+        self.assertEqual(user.profile_version, 3)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_bulk_create_users_on_primary(self):
+        # Test that the checks and the inserts all use the write alias, not
+        # a replica the router would read from
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        get_user_model().objects.create_user('taken@example.com', 'test123')
+        with patch.object(router, 'db_for_read', return_value='replica'):
+            users, errors = get_user_model().objects.bulk_create_users([
+                {'email': 'one@example.com', 'password': 'test123'},
+                {'email': 'taken@example.com', 'password': 'test123'},
+            ])
+
+        self.assertEqual([user.email for user in users], ['one@example.com'])
+        self.assertEqual(list(errors), [1])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
     def test_new_user_invalid_email(self):
         self.cmd.stdout.write(
             f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
@@ -66,6 +141,28 @@ class ModelTests(TestCase):
 
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
 
+    def test_bulk_create_users(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        get_user_model().objects.create_user('taken@example.com', 'test123')
+        users, errors = get_user_model().objects.bulk_create_users([
+            {'email': 'one@EXAMPLE.com', 'password': 'test123'},
+            {'email': 'taken@example.com', 'password': 'test123'},
+            {'email': '', 'password': 'test123'},
+            {'email': 'two@example.com', 'password': 'test123'},
+        ], batch_size=2)
+
+        self.assertEqual(
+            [user.email for user in users],
+            ['one@example.com', 'two@example.com']
+        )
+        self.assertEqual(sorted(errors), [1, 2])
+        user = get_user_model().objects.get(email='two@example.com')
+        self.assertTrue(user.check_password('test123'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
     def test_create_recipe(self):
         # Test creating a recipe is successful
         self.cmd.stdout.write(f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
@@ -0,0 +1,92 @@
+import inspect
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand
+
+from core import permission_cache
+
+
+@override_settings(PERMISSION_CACHE={'ALIAS': 'default', 'TTL': 60})
+class PermissionCacheTests(TestCase):
+    # Test the permissions cached across requests by PooledModelBackend
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        permission_cache.get_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@gmail.com',
+            password='test123',
+            name='Test'
+        )
+        self.view_user = Permission.objects.get(codename='view_user')
+        self.change_user = Permission.objects.get(codename='change_user')
+
+    def fresh_user(self):
+        # What the next request gets, without the permissions ModelBackend
+        # keeps on the instance
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_cached_across_requests(self):
+        # Test that only the first check of a user queries its permissions
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.user.user_permissions.add(self.view_user)
+        user = self.fresh_user()
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm('core.view_user'))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('core.view_user'))
+            self.assertFalse(user.has_perm('core.change_user'))
+            self.assertTrue(user.has_module_perms('core'))
+        self.assertEqual(user.get_all_permissions(), {'core.view_user'})
+
+        with override_settings(PERMISSION_CACHE={'ALIAS': '', 'TTL': 60}):
+            user = self.fresh_user()
+            with self.assertNumQueries(2):
+                self.assertTrue(user.has_perm('core.view_user'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_user_changes(self):
+        # Test that permissions, groups and flags of a user invalidate it
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.assertFalse(self.fresh_user().has_perm('core.view_user'))
+        self.user.user_permissions.add(self.view_user)
+        self.assertTrue(self.fresh_user().has_perm('core.view_user'))
+        self.view_user.user_set.remove(self.user)
+        self.assertFalse(self.fresh_user().has_perm('core.view_user'))
+
+        group = Group.objects.create(name='Support')
+        group.permissions.add(self.change_user)
+        self.user.groups.add(group)
+        self.assertTrue(self.fresh_user().has_perm('core.change_user'))
+        group.user_set.clear()
+        self.assertFalse(self.fresh_user().has_perm('core.change_user'))
+
+        self.user.is_superuser = True
+        self.user.save()
+        user = self.fresh_user()
+        self.assertIn('core.change_user', user.get_group_permissions())
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_group_changes(self):
+        # Test that changing or deleting a group reaches its members
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        group = Group.objects.create(name='Support')
+        self.user.groups.add(group)
+        self.assertFalse(self.fresh_user().has_perm('core.view_user'))
+        group.permissions.add(self.view_user)
+        self.assertTrue(self.fresh_user().has_perm('core.view_user'))
+        group.delete()
+        self.assertFalse(self.fresh_user().has_perm('core.view_user'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
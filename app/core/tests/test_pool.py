@@ -0,0 +1,99 @@
+import inspect
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.core.management.base import BaseCommand
+
+from core.db import pool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def make_pool(self, **kwargs):
+        kwargs.setdefault('health_check', lambda conn: conn.healthy)
+        kwargs.setdefault('reset', lambda conn: not conn.closed)
+        return pool.ConnectionPool(self.connect, **kwargs)
+
+    def test_connections_are_reused(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that a returned connection is handed out again
+        connection_pool = self.make_pool(min_size=1)
+        connection_pool.prefill()
+
+        conn = connection_pool.getconn()
+        connection_pool.putconn(conn)
+
+        self.assertIs(connection_pool.getconn(), conn)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(connection_pool.get_stats()['checkouts'], 2)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_max_size_timeout(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that callers give up when the pool stays exhausted
+        connection_pool = self.make_pool(max_size=1, timeout=0.05)
+        connection_pool.getconn()
+
+        with self.assertRaises(pool.PoolTimeout):
+            connection_pool.getconn()
+        self.assertEqual(connection_pool.get_stats()['timeouts'], 1)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_waiter_gets_returned_connection(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that a waiting caller is woken up by putconn
+        connection_pool = self.make_pool(max_size=1, timeout=5)
+        conn = connection_pool.getconn()
+        timer = threading.Timer(0.05, connection_pool.putconn, [conn])
+        timer.start()
+
+        self.assertIs(connection_pool.getconn(), conn)
+        timer.join()
+        self.assertGreater(connection_pool.get_stats()['wait_seconds_max'], 0)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_unhealthy_and_expired_connections_replaced(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that broken or too old connections are not reused
+        connection_pool = self.make_pool(health_check_after=0)
+        conn = connection_pool.getconn()
+        connection_pool.putconn(conn)
+        conn.healthy = False
+
+        fresh = connection_pool.getconn()
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+
+        connection_pool.max_lifetime = 60
+        connection_pool.putconn(fresh)
+        with patch('time.monotonic', return_value=10 ** 9):
+            self.assertIsNot(connection_pool.getconn(), fresh)
+        self.assertTrue(fresh.closed)
+        self.assertEqual(connection_pool.get_stats()['size'], 1)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
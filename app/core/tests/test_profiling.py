@@ -0,0 +1,114 @@
+import asyncio
+import inspect
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.urls import reverse
+from django.core.management.base import BaseCommand
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import profiling
+
+METRICS_URL = reverse('api-metrics')
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingTests(TestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+        self.client = APIClient()
+
+    def test_metrics_require_staff(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertIn(res.status_code, (
+            status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_requests_are_profiled(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+        # Test that a login shows up with its query, serializer and hashing
+        # timings
+        res = self.client.post(reverse('user:token'), {
+            'email': 'admin@gmail.com',
+            'password': '123456',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.admin_user)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('app_request_duration_seconds_count{view="user:token"}', body)
+        self.assertIn('app_db_queries_count{view="user:token"}', body)
+        self.assertIn(
+            'app_section_duration_seconds_count'
+            '{section="password_hash",view="user:token"}', body)
+        self.assertIn(
+            'app_section_duration_seconds_count'
+            '{section="serializer",view="user:token"}', body)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_n_plus_one_detected(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        def view(request):
+            for _ in range(10):
+                get_user_model().objects.filter(pk=self.admin_user.pk).first()
+            return HttpResponse()
+
+        before = profiling.N_PLUS_ONE._values.get(
+            (('view', 'unmatched'),), 0)
+        with self.assertLogs('core.profiling', 'WARNING'):
+            profiling.ProfilingMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertEqual(
+            profiling.N_PLUS_ONE._values[(('view', 'unmatched'),)],
+            before + 1)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_async_requests_are_profiled(self):
+        # Test that under ASGI the middleware is awaited, and still sees the
+        # queries the request runs in threads
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        def query():
+            return get_user_model().objects.filter(
+                pk=self.admin_user.pk).first()
+
+        async def view(request):
+            for _ in range(10):
+                await sync_to_async(query)()
+            return HttpResponse()
+
+        middleware = profiling.ProfilingMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        before = profiling.N_PLUS_ONE._values.get(
+            (('view', 'unmatched'),), 0)
+        with self.assertLogs('core.profiling', 'WARNING'):
+            async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertEqual(
+            profiling.N_PLUS_ONE._values[(('view', 'unmatched'),)],
+            before + 1)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
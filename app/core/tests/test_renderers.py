@@ -0,0 +1,120 @@
+import datetime
+import decimal
+import inspect
+import io
+from unittest import skipIf
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from django.core.management.base import BaseCommand
+
+from rest_framework import negotiation, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.negotiation import FastContentNegotiation
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+
+DATA = {
+    'email': 'test@gmail.com',
+    'name': 'Line\u2028separator',
+    'joined': datetime.datetime(
+        2021, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+    'balance': decimal.Decimal('1.50'),
+    'label': gettext_lazy('Personal Info'),
+    'ids': (1, 2),
+    1: None,
+}
+
+
+class StdlibJSONRenderer(FastJSONRenderer):
+    use_orjson = False
+
+
+class StdlibJSONParser(FastJSONParser):
+    use_orjson = False
+
+
+class FastJSONTests(TestCase):
+    # Test that the fast renderer and parser behave like the stock ones
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_renderer_output(self):
+        # Test that orjson renders the same bytes as the DRF renderer
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        expected = renderers.JSONRenderer().render(DATA)
+        self.assertEqual(FastJSONRenderer().render(DATA), expected)
+        self.assertIn(b'\\u2028', expected)
+        # Pretty printing goes through the stock renderer
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, 'application/json; indent=4'),
+            renderers.JSONRenderer().render(
+                DATA, 'application/json; indent=4'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_stdlib_fallback(self):
+        # Test the code paths used without orjson
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        body = renderers.JSONRenderer().render({'email': 'test@gmail.com'})
+        self.assertEqual(
+            StdlibJSONRenderer().render(DATA),
+            renderers.JSONRenderer().render(DATA))
+        self.assertEqual(
+            StdlibJSONParser().parse(io.BytesIO(body)),
+            {'email': 'test@gmail.com'})
+        with self.assertRaises(ParseError):
+            StdlibJSONParser().parse(io.BytesIO(b'{"value": NaN}'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_parser(self):
+        # Test parsing, including invalid and non UTF-8 bodies
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        parser = FastJSONParser()
+        self.assertEqual(
+            parser.parse(io.BytesIO('{"name": "Zoë"}'.encode())),
+            {'name': 'Zoë'})
+        self.assertEqual(
+            parser.parse(
+                io.BytesIO('{"name": "Zoë"}'.encode('latin-1')),
+                parser_context={'encoding': 'latin-1'}),
+            {'name': 'Zoë'})
+        for body in (b'{"name": ', b'{"value": NaN}'):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_negotiation(self):
+        # Test that the shortcut picks what the full negotiation would
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        available = [FastJSONRenderer(), renderers.BrowsableAPIRenderer()]
+        factory = APIRequestFactory()
+        for path, accept in (
+                ('/', '*/*'),
+                ('/', 'application/json'),
+                ('/', 'application/json; indent=4'),
+                ('/', 'text/html,application/xhtml+xml,*/*;q=0.8'),
+                ('/?format=api', '*/*')):
+            request = Request(factory.get(path, HTTP_ACCEPT=accept))
+            renderer, media_type = FastContentNegotiation().select_renderer(
+                request, available)
+            expected = negotiation.DefaultContentNegotiation(
+            ).select_renderer(request, available)
+            self.assertIs(renderer, expected[0])
+            self.assertEqual(media_type, expected[1])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -0,0 +1,167 @@
+import asyncio
+import inspect
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import SimpleTestCase, RequestFactory, override_settings
+from django.http import HttpResponse
+from django.core.management.base import BaseCommand
+
+from core.db import routers
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_0', 'replica_1'],
+    REPLICA_MAX_LAG=5,
+    REPLICA_CHECK_INTERVAL=60,
+)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.router = routers.ReplicaRouter()
+        routers.unpin()
+        routers._replica_health.clear()
+        routers._replica_checks.clear()
+        self.lags = {'replica_0': 0, 'replica_1': 0}
+        patcher = patch('core.db.routers.check_replica', self.lags.get)
+        self.check_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(routers.unpin)
+        self.refresh_health()
+
+    def refresh_health(self):
+        # Runs the background checks of every replica and waits for them
+        routers._replica_health.clear()
+        for alias in self.lags:
+            routers.is_replica_usable(alias)
+        for check in list(routers._replica_checks.values()):
+            check.join(5)
+
+    def test_reads_go_to_replicas(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.assertIn(self.router.db_for_read(None), self.lags)
+        self.assertEqual(self.router.db_for_write(None), 'default')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_reads_after_write_go_to_primary(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.router.db_for_write(None)
+
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_lagging_or_down_replicas_skipped(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.lags.update({'replica_0': 30, 'replica_1': 0})
+        self.refresh_health()
+        for _ in range(10):
+            self.assertEqual(self.router.db_for_read(None), 'replica_1')
+
+        # Results are cached until the next check
+        self.lags.update({'replica_0': 30, 'replica_1': None})
+        self.assertEqual(self.router.db_for_read(None), 'replica_1')
+        self.refresh_health()
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_check_does_not_block_requests(self):
+        # Test that replicas are checked on a background thread, requests
+        # use the last result (the primary at first) instead of waiting
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        routers._replica_health.clear()
+        started, release = threading.Event(), threading.Event()
+
+        def slow_check(alias):
+            started.set()
+            release.wait(5)
+            return 0
+
+        with patch('core.db.routers.check_replica', slow_check):
+            self.assertFalse(routers.is_replica_usable('replica_0'))
+            self.assertTrue(started.wait(5))
+            check = routers._replica_checks['replica_0']
+            self.assertIsNot(check, threading.current_thread())
+            # A single check runs at a time
+            self.assertFalse(routers.is_replica_usable('replica_0'))
+            self.assertIs(routers._replica_checks['replica_0'], check)
+            release.set()
+            check.join(5)
+        self.assertNotIn('replica_0', routers._replica_checks)
+        self.assertTrue(routers.is_replica_usable('replica_0'))
+
+        # Later checks keep the last result meanwhile
+        routers._replica_health['replica_0'] = (True, -3600)
+        started.clear()
+        release.clear()
+        with patch('core.db.routers.check_replica', slow_check):
+            self.assertTrue(routers.is_replica_usable('replica_0'))
+            self.assertTrue(started.wait(5))
+            check = routers._replica_checks['replica_0']
+            release.set()
+            check.join(5)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_middleware_pins_after_write(self):
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        def view(request):
+            self.router.db_for_write(None)
+            return HttpResponse()
+
+        middleware = routers.ReplicaPinningMiddleware(view)
+        response = middleware(RequestFactory().patch('/'))
+        self.assertIn(middleware.cookie_name, response.cookies)
+        self.assertFalse(routers.is_pinned())
+
+        # Later safe requests of the same client read from the primary
+        seen = []
+        middleware = routers.ReplicaPinningMiddleware(
+            lambda request: seen.append(self.router.db_for_read(None))
+            or HttpResponse())
+        request = RequestFactory().get('/')
+        request.COOKIES[middleware.cookie_name] = '1'
+        middleware(request)
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(seen[0], 'default')
+        self.assertIn(seen[1], self.lags)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_async_middleware(self):
+        # Test that under ASGI the middleware is awaited, and sees the
+        # writes the request makes in threads
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        seen = []
+
+        async def view(request):
+            seen.append(self.router.db_for_read(None))
+            await sync_to_async(self.router.db_for_write)(None)
+            seen.append(self.router.db_for_read(None))
+            return HttpResponse()
+
+        middleware = routers.ReplicaPinningMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertIn(seen[0], self.lags)
+        self.assertEqual(seen[1], 'default')
+        self.assertIn(middleware.cookie_name, response.cookies)
+        self.assertFalse(routers.is_pinned())
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
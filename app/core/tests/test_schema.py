@@ -0,0 +1,109 @@
+import gzip
+import inspect
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+SCHEMA_URL = reverse('api-schema')
+JSON = 'application/vnd.oai.openapi+json'
+
+
+class CachedSchemaTests(TestCase):
+    # Test the schema served from memory
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        schema.reset()
+
+    def tearDown(self) -> None:
+        schema.reset()
+
+    def test_generated_once(self):
+        # Test that only the first request introspects the API
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with patch('core.schema.generate', wraps=schema.generate) as generate:
+            first = self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON)
+            second = self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON)
+        self.assertEqual(generate.call_count, 1)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Type'], JSON)
+        self.assertEqual(first.content, second.content)
+        self.assertIn('/api/user/create/', json.loads(first.content)['paths'])
+
+        res = self.client.get(SCHEMA_URL)
+        self.assertTrue(res.content.startswith(b'openapi:'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_etag_and_gzip(self):
+        # Test the conditional GET and the compressed body
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON)
+        etag = res['ETag']
+        res = self.client.get(
+            SCHEMA_URL, HTTP_ACCEPT=JSON, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+        compressed = self.client.get(
+            SCHEMA_URL, HTTP_ACCEPT=JSON, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertNotEqual(compressed['ETag'], etag)
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(
+            gzip.decompress(compressed.content),
+            self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON).content)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_generate_schema_artifact(self):
+        # Test that the artifact written by the command is served as it is
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'openapi.json')
+            out = io.StringIO()
+            call_command('generate_schema', output=path, stdout=out)
+            self.assertIn('Wrote schema', out.getvalue())
+
+            with open(path, 'rb') as artifact:
+                body = artifact.read()
+            with override_settings(API_SCHEMA_FILE=path), \
+                    patch('core.schema.generate') as generate:
+                res = self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON)
+                generate.assert_not_called()
+
+        self.assertEqual(res.content, body)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_corrupt_schema_artifact(self):
+        # Test that a corrupt artifact falls back to the live schema
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'openapi.json')
+            with open(path, 'w') as artifact:
+                artifact.write('{"openapi": "3.0.3", "pa')
+            with override_settings(API_SCHEMA_FILE=path), \
+                    self.assertLogs('core.schema', 'ERROR'):
+                res = self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('paths', json.loads(res.content))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -0,0 +1,103 @@
+import datetime
+import inspect
+from unittest.mock import patch
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from rest_framework import serializers
+
+from core.serializers import CachedModelSerializer
+from user.serializers import UserSerializer
+
+
+class LoginSerializer(CachedModelSerializer):
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'email', 'last_login')
+
+
+class GreetingSerializer(CachedModelSerializer):
+    greeting = serializers.SerializerMethodField()
+
+    class Meta:
+        model = get_user_model()
+        fields = ('email', 'greeting')
+
+    def get_greeting(self, obj):
+        return 'Hello ' + obj.name
+
+
+class CachedSerializerTests(TestCase):
+    # Test the serializers building their fields once per class
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.user = get_user_model()(id=1, email='test@gmail.com', name='Test')
+
+    def test_fields_built_once(self):
+        # Test that the model is only introspected once, and that every
+        # serializer still gets its own bound fields
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        LoginSerializer().fields
+        with patch.object(
+                serializers.ModelSerializer, 'get_fields') as get_fields:
+            first = LoginSerializer(self.user)
+            second = LoginSerializer()
+            self.assertEqual(list(first.fields), ['id', 'email', 'last_login'])
+            get_fields.assert_not_called()
+
+        self.assertIsNot(first.fields['email'], second.fields['email'])
+        self.assertIs(first.fields['email'].parent, first)
+        self.assertIs(second.fields['email'].parent, second)
+        self.assertEqual(first.data['email'], 'test@gmail.com')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_validation(self):
+        # Test that the cached validators still run per serializer
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        serializer = UserSerializer(
+            data={'email': 'not an email', 'password': 'test123'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('email', serializer.errors)
+        serializer = UserSerializer(
+            data={'email': 'new@gmail.com', 'password': 'tst', 'name': 'New'})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(list(serializer.errors), ['password'])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_represent(self):
+        # Test that the shortcut gives the same output as .data
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.assertEqual(
+            UserSerializer.represent(self.user), UserSerializer(self.user).data)
+        self.assertEqual(
+            LoginSerializer.represent(self.user),
+            {'id': 1, 'email': 'test@gmail.com', 'last_login': None})
+        self.user.last_login = datetime.datetime(
+            2021, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(
+            LoginSerializer.represent(self.user),
+            LoginSerializer(self.user).data)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_represent_fallback(self):
+        # Test that fields needing the serializer use the full machinery
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.assertIsNone(GreetingSerializer._representation_plan())
+        self.assertEqual(
+            GreetingSerializer.represent(self.user),
+            {'email': 'test@gmail.com', 'greeting': 'Hello Test'})
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -0,0 +1,92 @@
+import importlib
+import inspect
+import os
+import sys
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand
+
+from core import serving
+
+
+class ServingTests(SimpleTestCase):
+    # Test the production server sizing and settings
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+
+    def read(self, files):
+        return patch.object(serving, '_read', side_effect=files.get)
+
+    def test_cgroup_cpu_limit(self):
+        # Test reading the CPU quota of cgroup v2 and v1
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with self.read({serving.CGROUP_V2_CPU_MAX: '150000 100000'}):
+            self.assertEqual(serving.cgroup_cpu_limit(), 1.5)
+        with self.read({serving.CGROUP_V2_CPU_MAX: 'max 100000'}):
+            self.assertIsNone(serving.cgroup_cpu_limit())
+        with self.read({
+                serving.CGROUP_V1_CPU_QUOTA: '200000',
+                serving.CGROUP_V1_CPU_PERIOD: '100000'}):
+            self.assertEqual(serving.cgroup_cpu_limit(), 2)
+        with self.read({
+                serving.CGROUP_V1_CPU_QUOTA: '-1',
+                serving.CGROUP_V1_CPU_PERIOD: '100000'}):
+            self.assertIsNone(serving.cgroup_cpu_limit())
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_sizing(self):
+        # Test that the quota caps the CPUs, and the sizes derived from them
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with patch.object(os, 'sched_getaffinity', return_value=set(range(8)), create=True):
+            with patch.object(serving, 'cgroup_cpu_limit', return_value=1.5):
+                self.assertEqual(serving.cpu_count(), 2)
+            with patch.object(serving, 'cgroup_cpu_limit', return_value=None):
+                self.assertEqual(serving.cpu_count(), 8)
+
+        self.assertEqual(serving.worker_count(1), 3)
+        self.assertEqual(serving.worker_count(4), 9)
+        self.assertEqual(serving.worker_count(32), 16)
+        self.assertEqual(serving.hashing_workers(8, 17), 1)
+        self.assertEqual(serving.hashing_workers(8, 3), 3)
+        self.assertEqual(serving.hashing_workers(8, 2), 4)
+        self.assertEqual(serving.hashing_workers(8, 1), 8)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_production_settings(self):
+        # Test that the production settings need a secret key and turn
+        # DEBUG and the browsable API off
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        sys.modules.pop('app.settings_production', None)
+        with patch.dict(os.environ, {'SECRET_KEY': ''}):
+            with self.assertRaises(ImproperlyConfigured):
+                importlib.import_module('app.settings_production')
+
+        environ = {'SECRET_KEY': 'secret', 'ALLOWED_HOSTS': 'api.example.com, localhost'}
+        with patch.dict(os.environ, environ):
+            settings = importlib.import_module('app.settings_production')
+        sys.modules.pop('app.settings_production', None)
+
+        self.assertFalse(settings.DEBUG)
+        self.assertEqual(settings.ALLOWED_HOSTS, ['api.example.com', 'localhost'])
+        self.assertEqual(
+            settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'],
+            ['core.renderers.FastJSONRenderer'])
+        # Static files served by the application, right after the security
+        # headers are set
+        security = settings.MIDDLEWARE.index(
+            'django.middleware.security.SecurityMiddleware')
+        self.assertEqual(
+            settings.MIDDLEWARE[security + 1],
+            'whitenoise.middleware.WhiteNoiseMiddleware')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -0,0 +1,174 @@
+import datetime
+import inspect
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from django.contrib.sessions.serializers import JSONSerializer
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+
+from core.sessions import CompactJSONSerializer, SessionStore
+
+
+class SessionTests(TestCase):
+    # Test the cached sessions of core.sessions, with a cache shared by the
+    # processes of this host
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.sessions = override_settings(
+            SESSION_ENGINE='core.sessions',
+            SESSION_CACHE_ALIAS='sessions',
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                },
+                'sessions': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': cls.cache_dir,
+                },
+            },
+        )
+        cls.sessions.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.sessions.disable()
+        shutil.rmtree(cls.cache_dir)
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+
+    def test_serializer(self):
+        # Test the short auth keys, and reading what JSONSerializer wrote
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        data = {SESSION_KEY: '1', 'next': '/admin/'}
+        serialized = CompactJSONSerializer().dumps(data)
+        self.assertIn(b'"@i":"1"', serialized)
+        self.assertNotIn(SESSION_KEY.encode(), serialized)
+        self.assertEqual(CompactJSONSerializer().loads(serialized), data)
+        self.assertEqual(
+            CompactJSONSerializer().loads(JSONSerializer().dumps(data)), data)
+
+        # Same bytes with and without orjson, non string keys included
+        data = {SESSION_KEY: '1', 'name': 'Zoë ✓', 'cart': {1: 2}}
+        serialized = CompactJSONSerializer().dumps(data)
+        with patch('core.sessions.orjson', None):
+            self.assertEqual(CompactJSONSerializer().dumps(data), serialized)
+            self.assertEqual(
+                CompactJSONSerializer().loads(serialized),
+                {SESSION_KEY: '1', 'name': 'Zoë ✓', 'cart': {'1': 2}})
+        self.assertEqual(
+            CompactJSONSerializer().loads(serialized)['name'], 'Zoë ✓')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_serializer_of_the_engine_only(self):
+        # Test that SESSION_SERIALIZER is left to the other engines
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.assertIs(SessionStore().serializer, CompactJSONSerializer)
+        self.assertIs(DBStore().serializer, JSONSerializer)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_per_process_cache(self):
+        # Test that a per-process cache is refused
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with override_settings(SESSION_CACHE_ALIAS='default'):
+            with self.assertRaises(ImproperlyConfigured):
+                SessionStore()
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_admin_requests(self):
+        # Test that a logged in admin is served from the cache, and that a
+        # logout reaches the database
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+        self.assertTrue(Session.objects.filter(pk=session_key).exists())
+
+        url = reverse('admin:index')
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            # The user and the recent actions of the index, no session query
+            with patch.object(DBStore, '_get_session_from_db') as from_db:
+                res = self.client.get(url)
+                from_db.assert_not_called()
+        self.assertEqual(res.status_code, 200)
+
+        self.client.logout()
+        self.assertFalse(Session.objects.filter(pk=session_key).exists())
+        self.assertFalse(SessionStore().exists(session_key))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_cache_ttl(self):
+        # Test that sessions stay in the cache at most SESSION_CACHE_TTL
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with override_settings(SESSION_CACHE_TTL=30):
+            store = SessionStore()
+            store[SESSION_KEY] = '1'
+            with patch.object(store._cache, 'set') as cache_set:
+                store.save()
+            self.assertEqual(cache_set.call_args[0][2], 30)
+
+            # A miss is filled from the database with the same timeout
+            store._cache.delete(store.cache_key)
+            store = SessionStore(store.session_key)
+            with patch.object(store._cache, 'set') as cache_set:
+                self.assertEqual(store[SESSION_KEY], '1')
+            self.assertEqual(cache_set.call_args[0][2], 30)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_purge_sessions(self):
+        # Test that only expired sessions are deleted, chunk by chunk
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        past = timezone.now() - datetime.timedelta(days=1)
+        Session.objects.bulk_create([
+            Session(session_key='expired%d' % i, session_data='', expire_date=past)
+            for i in range(5)
+        ])
+        store = SessionStore()
+        store.create()
+
+        out = io.StringIO()
+        call_command('purge_sessions', dry_run=True, stdout=out)
+        self.assertIn('5 expired sessions', out.getvalue())
+
+        out = io.StringIO()
+        call_command('purge_sessions', chunk_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('pk', flat=True)),
+            [store.session_key])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
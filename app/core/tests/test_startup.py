@@ -0,0 +1,117 @@
+import inspect
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.urls import resolve, reverse
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core import startup
+
+IMPORTTIME = '''import time: self [us] | cumulative | imported package
+import time:       200 |        200 |     django.utils.regex_helper
+import time:      1500 |       1700 |   django.urls.resolvers
+import time:       300 |       2000 | django.urls
+import time:      4000 |       4000 | yaml
+'''
+
+# Run in a fresh interpreter, the test runner has already imported everything
+REVERSE_PROBE = '''
+import json, sys
+import django
+django.setup()
+from django.urls import resolve, reverse
+reverse('user:create')
+reverse('api-schema')
+resolve('/api/user/token/')
+resolve('/api/docs/')
+modules = ['app.urls_admin', 'core.schema_views', 'drf_spectacular.views']
+loaded = [[module for module in modules if module in sys.modules]]
+reverse('admin:index')
+loaded.append([module for module in modules if module in sys.modules])
+print(json.dumps(loaded))
+'''
+
+
+class StartupTests(SimpleTestCase):
+    # Test the startup report and the lazily loaded URLconfs
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+
+    def test_parse_importtime(self):
+        # Test reading the -X importtime output
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        imports = startup.parse_importtime(IMPORTTIME)
+        self.assertEqual(imports[0], startup.ImportTime(
+            'django.utils.regex_helper', 0.2, 0.2, 2))
+        self.assertEqual([module.depth for module in imports], [2, 1, 0, 0])
+        self.assertEqual(
+            startup.by_package(imports), [('yaml', 4.0), ('django', 2.0)])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_report(self):
+        # Test that a fresh worker does not load the docs and the admin
+        # URLconfs
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'startup.json')
+            out = io.StringIO()
+            call_command('startup_report', runs=1, top=3, output=path, stdout=out)
+            with open(path) as output:
+                report = json.load(output)
+
+        self.assertEqual(
+            list(report['phases']), ['settings', 'apps', 'middleware', 'urls'])
+        self.assertIn('total', out.getvalue())
+        modules = {module['module'] for module in report['modules']}
+        self.assertIn('core.views', modules)
+        self.assertNotIn('core.schema_views', modules)
+        self.assertNotIn('drf_spectacular.views', modules)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_lazy_urls(self):
+        # Test that the lazily included URLs resolve and reverse as before
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.assertEqual(reverse('api-schema'), '/api/schema/')
+        self.assertEqual(resolve('/api/docs/').url_name, 'api-docs')
+        self.assertEqual(reverse('admin:index'), '/admin/')
+        self.assertEqual(
+            resolve('/admin/core/user/').view_name, 'admin:core_user_changelist')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_reverse_stays_lazy(self):
+        # Test that resolving and reversing the API URLs does not import the
+        # admin and the docs
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        result = subprocess.run(
+            [sys.executable, '-c', REVERSE_PROBE],
+            cwd=settings.BASE_DIR,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'app.settings')),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            universal_newlines=True,
+        )
+        before, after = json.loads(result.stdout.splitlines()[-1])
+        self.assertEqual(before, [])
+        self.assertEqual(after, ['app.urls_admin'])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
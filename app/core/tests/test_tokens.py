@@ -0,0 +1,179 @@
+import datetime
+import inspect
+import io
+from django.test import TestCase, override_settings
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import tokens
+from core.models import AuthToken
+from user.authentication import get_token_cache
+
+TOKEN_URL = reverse('user:token')
+ROTATE_TOKEN_URL = reverse('user:token-rotate')
+CURRENT_USER_URL = reverse('user:currentuser')
+
+
+def token_settings(**config):
+    return override_settings(AUTH_TOKEN=dict(settings.AUTH_TOKEN, **config))
+
+
+class AuthTokenTests(TestCase):
+    # Test issuing, rotating and expiring tokens
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.user = get_user_model().objects.create_user(
+            email='test@gmail.com',
+            password='test123',
+            name='Test'
+        )
+        self.client = APIClient()
+        get_token_cache().clear()
+        tokens.last_used.clear()
+        # Restart the flush interval, so that no request flushes in a test
+        tokens.last_used.flush()
+
+    def test_key_storage(self):
+        # Test that the key is stored as raw bytes and looked up from hex
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        token = AuthToken.objects.issue(self.user)
+
+        self.assertEqual(len(token.key), 40)
+        self.assertEqual(len(bytes(token.raw_key)), 20)
+        self.assertEqual(AuthToken.objects.lookup(token.key), token)
+        self.assertEqual(AuthToken.objects.lookup(token.key.upper()), token)
+        with self.assertRaises(AuthToken.DoesNotExist):
+            AuthToken.objects.lookup('not hex')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_login_reuses_then_rotates(self):
+        # Test that logging in hands out the current token until it is due
+        # for rotation
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        payload = {'email': 'test@gmail.com', 'password': 'test123'}
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('expires_at', res.data)
+        first = res.data['token']
+
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertEqual(res.data['token'], first)
+
+        AuthToken.objects.filter(user=self.user).update(
+            created_at=timezone.now() - datetime.timedelta(
+                seconds=settings.AUTH_TOKEN['ROTATE_AFTER'] + 1))
+        res = self.client.post(TOKEN_URL, payload)
+        self.assertNotEqual(res.data['token'], first)
+
+        old = AuthToken.objects.lookup(first)
+        self.assertLessEqual(
+            old.expires_at, timezone.now() + datetime.timedelta(
+                seconds=settings.AUTH_TOKEN['ROTATION_GRACE']))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    @token_settings(ROTATION_GRACE=0)
+    def test_rotate_endpoint(self):
+        # Test that the old token stops working once its grace period ends,
+        # even though it was cached
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        token = AuthToken.objects.issue(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.assertEqual(
+            self.client.get(CURRENT_USER_URL).status_code, status.HTTP_200_OK)
+
+        res = self.client.post(ROTATE_TOKEN_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        new_key = res.data['token']
+        self.assertNotEqual(new_key, token.key)
+
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + new_key)
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_expired_token_rejected(self):
+        # Test that expiry is checked on cached tokens too
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        token = AuthToken.objects.issue(
+            self.user, now=timezone.now() - datetime.timedelta(
+                seconds=settings.AUTH_TOKEN['TTL'] - 1))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.assertEqual(
+            self.client.get(CURRENT_USER_URL).status_code, status.HTTP_200_OK)
+
+        get_token_cache().set(token.key, self.user, AuthToken(
+            pk=token.pk, raw_key=token.raw_key, user=self.user,
+            created_at=token.created_at,
+            expires_at=timezone.now() - datetime.timedelta(seconds=1)))
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(str(res.data['detail']), 'Token has expired.')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_last_used_is_batched(self):
+        # Test that requests only fill the buffer, and that one flush writes
+        # every pending token
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        issued = [AuthToken.objects.issue(self.user) for _ in range(3)]
+        for token in issued:
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+            self.client.get(CURRENT_USER_URL)
+
+        self.assertEqual(len(tokens.last_used), 3)
+        self.assertFalse(AuthToken.objects.filter(
+            last_used_at__isnull=False).exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(tokens.last_used.flush(), 3)
+        self.assertEqual(AuthToken.objects.filter(
+            last_used_at__isnull=False).count(), 3)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_purge_expired_tokens(self):
+        # Test that only expired tokens are deleted, chunk by chunk
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        past = timezone.now() - datetime.timedelta(
+            seconds=settings.AUTH_TOKEN['TTL'] + 60)
+        for _ in range(5):
+            AuthToken.objects.issue(self.user, now=past)
+        valid = AuthToken.objects.issue(self.user)
+
+        out = io.StringIO()
+        call_command('purge_expired_tokens', dry_run=True, stdout=out)
+        self.assertIn('5 expired tokens', out.getvalue())
+        self.assertEqual(AuthToken.objects.count(), 6)
+
+        out = io.StringIO()
+        call_command('purge_expired_tokens', chunk_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired tokens', out.getvalue())
+        self.assertEqual(list(AuthToken.objects.all()), [valid])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -0,0 +1,37 @@
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.buffers import WriteBuffer
+from core.models import AuthToken
+
+
+def _write_last_used(pending):
+    # pending maps token ids to the minute they were last used, so that a
+    # flush runs one UPDATE per distinct minute rather than one per token
+    by_minute = defaultdict(list)
+    for token_id, minute in pending.items():
+        by_minute[minute].append(token_id)
+    for minute, token_ids in by_minute.items():
+        AuthToken.objects.filter(pk__in=token_ids).update(last_used_at=minute)
+
+
+last_used = WriteBuffer(
+    'token last_used_at', _write_last_used,
+    interval=settings.AUTH_TOKEN['LAST_USED_INTERVAL'])
+
+
+def record_use(token, now=None):
+    # Called on every authenticated request, only touches the buffer when
+    # the stored value is older than the flush interval
+    # Returns whether the use was recorded, token.last_used_at then holds
+    # the value that will be written
+    now = now or timezone.now()
+    interval = datetime.timedelta(seconds=last_used.interval)
+    if token.last_used_at is not None and now - token.last_used_at < interval:
+        return False
+    token.last_used_at = now.replace(second=0, microsecond=0)
+    last_used.add(token.pk, token.last_used_at)
+    return True
@@ -0,0 +1,16 @@
+from django.http import HttpResponse
+
+from rest_framework import permissions, views
+
+from core import metrics
+
+
+class MetricsView(views.APIView):
+    # Expose the collected metrics in the Prometheus text format
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            metrics.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -0,0 +1,73 @@
+# Production server configuration, read by gunicorn from the working
+# directory (/app in the image):
+#
+#     gunicorn
+#
+# Every value can be overridden with the environment variables below, or on
+# the command line. Send HUP to the master for a graceful reload of the
+# workers (with GUNICORN_PRELOAD=0 to pick up new code, a preloaded
+# application only changes with a new master: USR2 then QUIT the old one)
+import os
+
+from core import serving
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings_production')
+
+cpus = serving.cpu_count()
+asgi = os.environ.get('USER_API_ASYNC') == '1'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(
+    os.environ.get('WEB_CONCURRENCY') or serving.worker_count(cpus))
+if asgi:
+    # The async views only pay off under an event loop (needs uvicorn)
+    wsgi_app = 'app.asgi:application'
+    worker_class = os.environ.get(
+        'GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+    threads = 1
+else:
+    wsgi_app = 'app.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+    worker_class = os.environ.get(
+        'GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+
+# Import the application once in the master, workers are forked from it
+# and share its memory
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+# Build the OpenAPI schema before forking, at the cost of a slower start
+warm_schema = os.environ.get('GUNICORN_WARM_SCHEMA', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers now and then, jittered so they do not restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+# Per worker resources sized from the worker count, unless set explicitly:
+# the hashing pools of all workers share the CPUs (one process each with the
+# default worker count), and a thread holds at most one database connection
+os.environ.setdefault(
+    'PASSWORD_HASHING_WORKERS', str(serving.hashing_workers(cpus, workers)))
+os.environ.setdefault('DB_POOL_MAX_SIZE', str(threads))
+
+
+def when_ready(server):
+    server.log.info(
+        'Serving %s with %d %s workers x %d threads (%d CPUs)',
+        wsgi_app, workers, worker_class, threads, cpus)
+    if preload_app:
+        if warm_schema:
+            # Built once here and shared by every worker (see core.schema)
+            from core import schema
+            schema.get_document()
+        # Forked workers must not share the master's connections
+        from django.db import connections
+        connections.close_all()
+
+
+def worker_exit(server, worker):
+    # Write what the write buffers still hold (token last use, last login)
+    from core import buffers
+    buffers.flush_all()
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        # Connect the cache invalidation handlers
+        from user import signals  # noqa: F401
+        from core import metrics
+        from user.authentication import token_cache_metrics
+        metrics.register_collector(token_cache_metrics)
+
+        # Build the serializer fields now rather than on the first request
+        from user.serializers import TokenSerializer, UserSerializer
+        UserSerializer.prime_fields()
+        TokenSerializer.prime_fields()
@@ -0,0 +1,196 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+
+from rest_framework import exceptions, generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from core import activity, hashing
+from core.models import AuthToken
+from user import profile_cache
+from user.authentication import CachedTokenAuthentication
+from user.serializers import AsyncTokenSerializer, UserSerializer
+from user.throttling import LoginRateThrottle
+
+# Coroutine versions of the views in user.views, enabled by USER_API_ASYNC
+# Under an ASGI server a request waiting on the database (in a thread) or on
+# the hashing pool no longer holds a worker thread, so one process can keep
+# many slow clients in flight
+# Django 3.2 has no async ORM, queries go through sync_to_async
+
+
+class AsyncAPIViewMixin:
+    # Serves an APIView whose handlers are coroutines natively under ASGI
+    # (and through async_to_sync under WSGI)
+    # Authentication runs up front in aperform_authentication(), since the
+    # lazy request.user of DRF would query the database from the event loop
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        # Django only awaits views that are coroutine functions
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        async_view.cls = cls
+        async_view.initkwargs = initkwargs
+        async_view.csrf_exempt = True
+        return async_view
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Same as APIView.dispatch, awaiting initial() and the handler
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(),
+                                  self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        if self.throttle_classes:
+            # Throttles keep their history in the cache
+            await sync_to_async(self.check_throttles)(request)
+
+    async def aperform_authentication(self, request):
+        # Same as Request._authenticate, awaiting the authenticators
+        # Those without an aauthenticate() method run in a thread
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None)
+            if authenticate is None:
+                authenticate = sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+
+class CreateUserView(AsyncAPIViewMixin, generics.GenericAPIView):
+    # Create a new user
+    serializer_class = UserSerializer
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        # No query, the unique email is checked by the INSERT
+        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.instance = await get_user_model().objects.acreate_user(
+                **serializer.validated_data)
+        except IntegrityError:
+            await sync_to_async(serializer.raise_if_email_taken)(
+                serializer.validated_data['email'])
+            raise
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class CreateTokenView(AsyncAPIViewMixin, generics.GenericAPIView):
+    # Create a new auth token for user
+    serializer_class = AsyncTokenSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Rejects brute forcing before any password gets hashed
+    throttle_classes = [LoginRateThrottle]
+    permission_classes = ()
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = await serializer.aauthenticate()
+        token = await sync_to_async(AuthToken.objects.get_or_rotate)(user)
+        activity.record_login(user)
+        return Response({'token': token.key, 'expires_at': token.expires_at})
+
+
+class ManageUserView(AsyncAPIViewMixin, generics.GenericAPIView):
+    # Manage the authenticated users
+    serializer_class = UserSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self):
+        # Retrieve and return the authenticated user
+        return self.request.user
+
+    async def get(self, request, *args, **kwargs):
+        # Read only, so the user is represented without building a serializer
+        user = self.get_object()
+        args = (
+            request, user,
+            lambda: self.get_serializer_class().represent(
+                user, self.get_serializer_context()),
+            self.get_renderer_context(),
+        )
+        if profile_cache.cacheable(request):
+            # The body cache may be a network round trip
+            return await sync_to_async(profile_cache.respond)(*args)
+        return profile_cache.respond(*args)
+
+    async def put(self, request, *args, **kwargs):
+        return await self.aupdate(request, partial=False)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.aupdate(request, partial=True)
+
+    async def aupdate(self, request, partial):
+        # Same as UserSerializer.update, with the password hashed on the
+        # hashing pool and a single UPDATE
+        user = self.get_object()
+        serializer = self.get_serializer(
+            user, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+
+        validated_data = dict(serializer.validated_data)
+        password = validated_data.pop('password', None)
+        for attr, value in validated_data.items():
+            setattr(user, attr, value)
+        if password:
+            await hashing.aset_password(user, password)
+        user.bump_profile_version()
+
+        def save():
+            with serializer.unique_email(user, validated_data.get('email')):
+                user.save()
+
+        await sync_to_async(save)()
+
+        return profile_cache.set_headers(
+            Response(serializer.data), request, user)
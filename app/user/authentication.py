@@ -0,0 +1,240 @@
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import authentication, exceptions
+
+from core import tokens
+from core.cache import LRUCache
+from core.models import AuthToken
+
+
+def snapshot(user, token):
+    # What the cache stores for a (user, token) pair: the database alias and
+    # the field values, without the password hash, which is loaded (as a
+    # deferred field) in the rare case a request needs it
+    # Nothing is shared with the instances a request gets, see restore()
+    def values(instance, exclude=()):
+        return {
+            field.attname: (
+                bytes(value) if isinstance(value, memoryview) else value)
+            for field in instance._meta.concrete_fields
+            if field.attname not in exclude
+            for value in [getattr(instance, field.attname)]
+        }
+    return user._state.db, values(user, exclude=('password',)), values(token)
+
+
+def restore(entry):
+    # New (user, token) instances from a snapshot, so that a view changing
+    # request.user never changes what other requests get
+    db, user_values, token_values = entry
+    user = get_user_model().from_db(
+        db, list(user_values), list(user_values.values()))
+    token = AuthToken.from_db(
+        db, list(token_values), list(token_values.values()))
+    token.user = user
+    return user, token
+
+
+class TokenCache:
+    # Cache mapping a token key to its (user, token) pair, stored as a
+    # snapshot(), in one of two tiers
+    # 1. A shared cache (any alias from CACHES) when one is configured:
+    #    workers reuse each other's lookups, and an invalidation reaches
+    #    every process at once
+    # 2. Otherwise an in-process LRU with a short TTL; invalidations only
+    #    reach the process they happen in, entries of the other processes
+    #    expire, so the TTL bounds how long a revoked token, a deactivated
+    #    user or an edited profile may still be served there
+    # The local tier is not used in front of the shared one, since it could
+    # not be invalidated from other processes
+
+    key_prefix = 'tokenauth:'
+
+    def __init__(self, max_entries=10000, local_ttl=30,
+                 shared_cache=None, shared_ttl=300):
+        self.local = LRUCache(max_entries=max_entries, ttl=local_ttl)
+        self.shared = caches[shared_cache] if shared_cache else None
+        self.shared_ttl = shared_ttl
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def get(self, key):
+        if self.shared is not None:
+            return self._get_shared(key)
+        return self._get_local(key)
+
+    async def aget(self, key):
+        # The local tier is served inline, only the shared tier (a network
+        # round trip for most backends) runs in a thread
+        if self.shared is not None:
+            return await sync_to_async(self._get_shared)(key)
+        return self._get_local(key)
+
+    def _get_local(self, key):
+        entry = self.local.get(key)
+        return None if entry is None else restore(entry)
+
+    def _get_shared(self, key):
+        entry = self.shared.get(self.key_prefix + key)
+        if entry is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        return restore(entry)
+
+    def set(self, key, user, token):
+        entry = snapshot(user, token)
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + key, entry, self.shared_ttl)
+        else:
+            self.local.set(key, entry)
+
+    async def aset(self, key, user, token):
+        if self.shared is None:
+            self.local.set(key, snapshot(user, token))
+        else:
+            await sync_to_async(self.set)(key, user, token)
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        if self.shared is not None:
+            self.shared.delete_many([self.key_prefix + key for key in keys])
+        else:
+            self.local.delete_many(keys)
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self):
+        stats = {
+            'local_%s' % name: value
+            for name, value in self.local.stats().items()
+        }
+        stats['shared_hits'] = self.shared_hits
+        stats['shared_misses'] = self.shared_misses
+        return stats
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    # Lazily build the process wide cache from the TOKEN_AUTH_CACHE setting
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                config = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+                _token_cache = TokenCache(
+                    max_entries=config.get('MAX_ENTRIES', 10000),
+                    local_ttl=config.get('LOCAL_TTL', 30),
+                    shared_cache=config.get('SHARED_CACHE') or None,
+                    shared_ttl=config.get('SHARED_TTL', 300),
+                )
+    return _token_cache
+
+
+def token_cache_metrics():
+    # Collector for core.metrics
+    stats = get_token_cache().stats()
+    yield (
+        'app_token_cache_lookups_total', 'counter',
+        'Token authentication cache lookups.',
+        [
+            ({'tier': 'local', 'result': 'hit'}, stats['local_hits']),
+            ({'tier': 'local', 'result': 'miss'}, stats['local_misses']),
+            ({'tier': 'shared', 'result': 'hit'}, stats['shared_hits']),
+            ({'tier': 'shared', 'result': 'miss'}, stats['shared_misses']),
+        ]
+    )
+    yield (
+        'app_token_cache_entries', 'gauge',
+        'Tokens held in the local cache.', [({}, stats['local_size'])]
+    )
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    # TokenAuthentication for core.AuthToken that remembers successful
+    # lookups instead of querying the token table on every request
+    # Cached entries are invalidated by the signal handlers in user.signals
+    # Expiry is checked on every request, and the last use of the token is
+    # recorded in batches by core.tokens; the cached copy is updated when
+    # the use is recorded, so the next requests skip the buffer until the
+    # next interval
+
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        entry = token_cache.get(key)
+        if entry is None:
+            # Unknown tokens raise here and are never cached
+            entry = self.lookup(key)
+            token_cache.set(key, *entry)
+        user, token = self.check(entry)
+        if tokens.record_use(token):
+            token_cache.set(key, user, token)
+        return user, token
+
+    def lookup(self, key):
+        try:
+            token = AuthToken.objects.lookup(key)
+        except AuthToken.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return token.user, token
+
+    def check(self, entry):
+        user, token = entry
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        now = timezone.now()
+        if token.is_expired(now):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        return user, token
+
+    async def aauthenticate(self, request):
+        # Coroutine version of authenticate(), used by user.async_views
+        # Same header parsing, only cache misses touch the database (from a
+        # thread)
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. '
+                    'Token string should not contain spaces.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. '
+                    'Token string should not contain invalid characters.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        entry = await token_cache.aget(key)
+        if entry is None:
+            entry = await sync_to_async(self.lookup)(key)
+            await token_cache.aset(key, *entry)
+        user, token = self.check(entry)
+        if tokens.record_use(token):
+            await token_cache.aset(key, user, token)
+        return user, token
@@ -0,0 +1,23 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions, status
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from core.hashing import HashingPoolSaturated
+
+
+class ServiceBusy(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The server is busy, please retry shortly.')
+    default_code = 'service_busy'
+
+
+def exception_handler(exc, context):
+    # Same as the default handler, plus mapping of backpressure errors raised
+    # outside of the api layer to 503 responses with a Retry-After hint
+    if isinstance(exc, HashingPoolSaturated):
+        exc = ServiceBusy()
+        response = drf_exception_handler(exc, context)
+        response['Retry-After'] = '1'
+        return response
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,96 @@
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from rest_framework import renderers
+from rest_framework.response import Response
+
+# Conditional GET and body cache of /api/user/currentuser/
+# Polling clients send back the ETag (If-None-Match) or Last-Modified
+# (If-Modified-Since) they got, and get a 304 without the profile being
+# serialized or rendered as long as User.profile_version did not move
+# With USER_PROFILE_CACHE['ALIAS'] set, the rendered JSON is also kept in
+# that cache; its key contains the version, so an edit makes the previous
+# body unreachable and it simply expires
+
+
+def etag(request, user):
+    # Strong validator of the profile as rendered for this request, the
+    # media type tells plain, indented and browsable renderings apart
+    variant = zlib.crc32(request.accepted_media_type.encode())
+    return '"%d-%d-%08x"' % (user.pk, user.profile_version, variant)
+
+
+def last_modified(user):
+    return int(user.profile_modified_at.timestamp())
+
+
+def not_modified(request, user):
+    # 304 response when the client already has this version, else None
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(
+        request._request, etag=etag(request, user),
+        last_modified=last_modified(user))
+    if response is not None:
+        set_headers(response, request, user)
+    return response
+
+
+def set_headers(response, request, user):
+    response['ETag'] = etag(request, user)
+    response['Last-Modified'] = http_date(last_modified(user))
+    # Per user, and always revalidated
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def get_cache():
+    alias = settings.USER_PROFILE_CACHE['ALIAS']
+    return caches[alias] if alias else None
+
+
+def cacheable(request):
+    # Only JSON is cached, the browsable API renders a whole page
+    return (get_cache() is not None
+            and isinstance(request.accepted_renderer, renderers.JSONRenderer))
+
+
+def body_key(request, user):
+    return 'userprofile:%s' % etag(request, user).strip('"')
+
+
+def cached_response(request, user):
+    # Response built from the cached body, None on a miss
+    body = get_cache().get(body_key(request, user))
+    if body is None:
+        return None
+    return HttpResponse(
+        body, content_type=request.accepted_renderer.media_type)
+
+
+def render_and_cache(request, user, data, renderer_context):
+    body = request.accepted_renderer.render(
+        data, request.accepted_media_type, renderer_context)
+    get_cache().set(
+        body_key(request, user), body, settings.USER_PROFILE_CACHE['TTL'])
+    return HttpResponse(
+        body, content_type=request.accepted_renderer.media_type)
+
+
+def respond(request, user, represent, renderer_context):
+    # Response to a GET of the profile of user, represent() returns the
+    # data and is only called when the body has to be rendered
+    response = not_modified(request, user)
+    if response is None and cacheable(request):
+        response = cached_response(request, user)
+        if response is None:
+            response = render_and_cache(
+                request, user, represent(), renderer_context)
+    if response is None:
+        response = Response(represent())
+    return set_headers(response, request, user)
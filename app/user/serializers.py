@@ -1,13 +1,100 @@
+import contextlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate
+from django.db import IntegrityError, models, router
 # To easily translate the strings in any language into human-readable version
 from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from core import backends, hashing, profiling
+from core.db.utils import savepoint_if_atomic
+from core.serializers import CachedModelSerializer, CachedSerializer
+
+
+class ProfiledSerializerMixin:
+    # Reports the time spent validating, saving and representing data as
+    # the "serializer" section of core.profiling
+
+    def is_valid(self, raise_exception=False):
+        with profiling.section('serializer'):
+            return super().is_valid(raise_exception=raise_exception)
+
+    def save(self, **kwargs):
+        with profiling.section('serializer'):
+            return super().save(**kwargs)
+
+    @property
+    def data(self):
+        with profiling.section('serializer'):
+            return super().data
+
+    @classmethod
+    def represent(cls, instance, context=None):
+        with profiling.section('serializer'):
+            return super().represent(instance, context)
+
+
+class BulkUserListSerializer(ProfiledSerializerMixin,
+                             serializers.ListSerializer):
+    # Used for UserSerializer(many=True)
+    # Every row is validated on its own: invalid rows are reported in
+    # row_errors (keyed by their position in the payload) and skipped instead
+    # of failing the whole list
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            message = _('Expected a list of items.')
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [message]},
+                code='not_a_list')
+        max_rows = settings.USER_BULK_CREATE_MAX_ROWS
+        if len(data) > max_rows:
+            message = _('Ensure this list has no more than %d items.')
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [message % max_rows]},
+                code='max_length')
+
+        self.row_errors = {}
+        self.row_indexes = []
+        ret = []
+        for index, item in enumerate(data):
+            try:
+                validated = self.child.run_validation(item)
+            except serializers.ValidationError as exc:
+                self.row_errors[index] = exc.detail
+            else:
+                ret.append(validated)
+                self.row_indexes.append(index)
+        return ret
+
+    def create(self, validated_data):
+        users, errors = get_user_model().objects.bulk_create_users(
+            validated_data)
+        for position, error in errors.items():
+            self.row_errors[self.row_indexes[position]] = error
+        return users
+
+
+class NormalizedEmailField(serializers.EmailField):
+    # Lowercases the email like UserManager.normalize_email, before the
+    # validators run, so that the unique check matches other case variants
 
+    def to_internal_value(self, data):
+        return get_user_model().objects.normalize_email(
+            super().to_internal_value(data))
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(ProfiledSerializerMixin, CachedModelSerializer):
     # Serializer for the users object
     # ModelSerializer helps save validated data to the self-defined model
+    # The fields are only built once, see core.serializers
+    serializer_field_mapping = dict(
+        CachedModelSerializer.serializer_field_mapping)
+    serializer_field_mapping[models.EmailField] = NormalizedEmailField
+
     class Meta:
         model = get_user_model()
         # fields contain what a user can change via the api
@@ -15,14 +102,23 @@ class UserSerializer(serializers.ModelSerializer):
         # Ensure the password is write-only, and the number of it should be above 5
         extra_kwargs = {
             'password': {'write_only': True, 'min_length': 5},
+            # No UniqueValidator (an EXISTS query before every write), the
+            # unique constraint is checked by the INSERT/UPDATE itself
+            'email': {'validators': []},
         }
+        # Used when many=True, e.g. by the bulk create endpoint
+        list_serializer_class = BulkUserListSerializer
     # This function will be called when django rest framework tries to create a user, passing validated data
 
     def create(self, validated_data):
         # This function gets called when the validation is successful
         # Overriden create function to create a new user with encrypted password and return it
         # The following function is defined in models.py in 'core' module
-        return get_user_model().objects.create_user(**validated_data)
+        try:
+            return get_user_model().objects.create_user(**validated_data)
+        except IntegrityError:
+            self.raise_if_email_taken(validated_data['email'])
+            raise
 
     def update(self, instance, validated_data):
         # The method is called whenever a user conduct the update action on the model this serializer represents
@@ -30,21 +126,46 @@ class UserSerializer(serializers.ModelSerializer):
         # Retrieve the password and remove it from the database
         # None parameter means that the user doesn't have to provide something to update the info
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            hashing.set_password(instance, password)
+        # New ETag for /api/user/currentuser/
+        instance.bump_profile_version()
+        with self.unique_email(instance, validated_data.get('email')):
+            return super().update(instance, validated_data)
 
-        return user
+    @contextlib.contextmanager
+    def unique_email(self, instance, email=None):
+        # Wraps the save of an existing user, see raise_if_email_taken
+        try:
+            with savepoint_if_atomic(router.db_for_write(type(instance))):
+                yield
+        except IntegrityError:
+            if email is not None:
+                self.raise_if_email_taken(email, instance)
+            raise
 
-class TokenSerializer(serializers.Serializer):
+    def raise_if_email_taken(self, email, instance=None):
+        # Called after an IntegrityError, raises the error UniqueValidator
+        # would have given when the email belongs to another user
+        manager = get_user_model()._default_manager
+        users = manager.db_manager(
+            router.db_for_write(manager.model)).filter(email=email)
+        if instance is not None:
+            users = users.exclude(pk=instance.pk)
+        if users.exists():
+            raise serializers.ValidationError(
+                {'email': [manager.unique_email_message()]}, code='unique')
+
+
+class TokenSerializer(ProfiledSerializerMixin, CachedSerializer):
     # Serializer for the user authentication object
-    email = serializers.EmailField()
+    email = NormalizedEmailField()
     password = serializers.CharField(
         style={'input_type': 'password'},
         trim_whitespace=False
     )
+    authentication_failed = _(
+        'Unable to authenticate with provided credentials')
     """
     Validation :
     1. input type
@@ -65,9 +186,33 @@ class TokenSerializer(serializers.Serializer):
         )
         # authentication fails
         if not user:
-            msg = _('Unable to authenticate with provided credentials')
-            raise serializers.ValidationError(msg, code='authentication')
+            raise serializers.ValidationError(
+                self.authentication_failed, code='authentication')
 
         attrs['user'] = user
         # Overriding the validate function requires returning "attrs" once the validation is successful
         return attrs
+
+
+class AsyncTokenSerializer(TokenSerializer):
+    # TokenSerializer for the async token view
+    # is_valid() only checks the fields, the credentials are then checked by
+    # aauthenticate() without blocking the event loop
+
+    def validate(self, attrs):
+        return attrs
+
+    async def aauthenticate(self):
+        # Adds the user to validated_data, raises like TokenSerializer does
+        user = await backends.aauthenticate(
+            request=self.context.get('request'),
+            username=self.validated_data['email'],
+            password=self.validated_data['password']
+        )
+        if not user:
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [
+                    self.authentication_failed]},
+                code='authentication')
+        self.validated_data['user'] = user
+        return user
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import AuthToken
+from user.authentication import get_token_cache
+
+
+@receiver(post_save, sender=AuthToken)
+@receiver(post_delete, sender=AuthToken)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # A token was deleted or rotated
+    get_token_cache().invalidate([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    # Any change to the user row (is_active, password, profile...) must be
+    # visible to the next authenticated request
+    if created:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    get_token_cache().invalidate(
+        AuthToken.objects.keys_for_user(instance.pk))
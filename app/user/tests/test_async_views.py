@@ -0,0 +1,218 @@
+import inspect
+import json
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.test import AsyncClient, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db import close_old_connections
+from django.urls import include, path
+from django.core.management.base import BaseCommand
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from app.asgi import application
+from core.models import AuthToken
+from user import async_views
+from user.authentication import get_token_cache
+
+# The async views are only routed with USER_API_ASYNC, mount them here
+urlpatterns = [
+    path('api/user/', include(([
+        path('create/', async_views.CreateUserView.as_view(), name='create'),
+        path('token/', async_views.CreateTokenView.as_view(), name='token'),
+        path(
+            'currentuser/',
+            async_views.ManageUserView.as_view(),
+            name='currentuser'
+        ),
+    ], 'user'))),
+]
+
+CREATE_USER_URL = '/api/user/create/'
+TOKEN_URL = '/api/user/token/'
+CURRENT_USER_URL = '/api/user/currentuser/'
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncUserAPITests(TestCase):
+    # Test the coroutine versions of the user API views
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@gmail.com',
+            password='test123',
+            name='Test'
+        )
+        self.token = AuthToken.objects.issue(self.user)
+        get_token_cache().clear()
+
+    def test_views_are_coroutines(self):
+        # Test that Django serves the views without a thread under ASGI
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        view = async_views.ManageUserView.as_view()
+        self.assertTrue(inspect.iscoroutinefunction(view))
+        self.assertIs(view.cls, async_views.ManageUserView)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_create_user(self):
+        # Test creating a user, and that emails stay unique
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        payload = {
+            'email': 'new@gmail.com',
+            'password': 'test123',
+            'name': 'New'
+        }
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('password', res.data)
+        user = get_user_model().objects.get(email=payload['email'])
+        self.assertTrue(user.check_password(payload['password']))
+
+        res = self.client.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_create_token(self):
+        # Test that a token is only given for valid credentials
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'test123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], self.token.key)
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'wrong'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('token', res.data)
+        self.assertIn('non_field_errors', res.data)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_update_current_user(self):
+        # Test retrieving and updating the authenticated user
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, {'email': 'test@gmail.com', 'name': 'Test'})
+        etag = res['ETag']
+        res = self.client.get(CURRENT_USER_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        res = self.client.patch(
+            CURRENT_USER_URL, {'name': 'Renamed', 'password': 'newpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Renamed')
+        self.assertTrue(self.user.check_password('newpass123'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_current_user_unauthorized(self):
+        # Test that authentication is required, including with a bad token
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    async def test_current_user_asgi(self):
+        # Test the view through the ASGI request handler
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        # AsyncClient takes header names as they are on Django 3.2
+        client = AsyncClient()
+        res = await client.get(
+            CURRENT_USER_URL, authorization='Token ' + self.token.key)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['email'], 'test@gmail.com')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class ASGIStreamingTests(TestCase):
+    # Test the streaming responses served by the ASGI application, see
+    # core.asgi
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+        self.token = AuthToken.objects.issue(self.admin_user)
+        get_token_cache().clear()
+        # The connection holds the test transaction, like AsyncClient does
+        request_started.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+
+    @async_to_sync
+    async def get(self, path, query_string=b''):
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': query_string,
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', ('Token ' + self.token.key).encode()),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output()
+        body = b''
+        while True:
+            message = await communicator.receive_output()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        await communicator.wait()
+        return start['status'], body
+
+    def test_export_users(self):
+        # Test that the export streams its rows, which query the database,
+        # from the ASGI application
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        users = [self.admin_user] + [
+            get_user_model().objects.create_user(
+                email='user%d@gmail.com' % i, password='test123')
+            for i in range(3)
+        ]
+        status_code, body = self.get('/api/user/export/', b'output=ndjson')
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [json.loads(line)['id'] for line in body.splitlines()],
+            [user.id for user in users])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
@@ -0,0 +1,152 @@
+import inspect
+from unittest.mock import patch
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.management.base import BaseCommand
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import tokens
+from core.models import AuthToken
+from user.authentication import TokenCache, get_token_cache
+
+CURRENT_USER_URL = reverse('user:currentuser')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    # Test the cached token authentication backend
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.user = get_user_model().objects.create_user(
+            email='test@gmail.com',
+            password='test1233',
+            name='Test'
+        )
+        self.token = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        get_token_cache().clear()
+
+    def test_token_lookup_is_cached(self):
+        # Test that only the first request queries the token table
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        hits = get_token_cache().stats()['local_hits']
+        with self.assertNumQueries(0):
+            res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(get_token_cache().stats()['local_hits'], hits + 1)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_deleted_token_is_invalidated(self):
+        # Test that a deleted token stops working straight away
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.client.get(CURRENT_USER_URL)
+        self.token.delete()
+        res = self.client.get(CURRENT_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_deactivated_user_is_invalidated(self):
+        # Test that changes to the user row invalidate the cached entry
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.client.get(CURRENT_USER_URL)
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(CURRENT_USER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_failed_update_does_not_leak(self):
+        # Test that a view changing request.user does not change the
+        # cached user, e.g. an update rejected after setting the fields by
+        # the request that filled the cache
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        get_user_model().objects.create_user(
+            email='other@gmail.com', password='test1233')
+        res = self.client.patch(CURRENT_USER_URL, {'email': 'other@gmail.com'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.data['email'], 'test@gmail.com')
+        self.assertTrue(res['ETag'].startswith('"%d-1-' % self.user.pk))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_shared_tier(self):
+        # Test that the shared tier holds no password hash, and hands out
+        # new instances
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        token_cache = TokenCache(shared_cache='default')
+        token_cache.set(self.token.key, self.user, self.token)
+        token_cache.local.clear()
+        db, user_values, token_values = token_cache.shared.get(
+            token_cache.key_prefix + self.token.key)
+        self.assertNotIn('password', user_values)
+        self.assertEqual(user_values['email'], 'test@gmail.com')
+
+        user, token = token_cache.get(self.token.key)
+        self.assertIsNot(user, self.user)
+        self.assertIs(token.user, user)
+        self.assertEqual(token.key, self.token.key)
+        user.name = 'Changed'
+        self.assertEqual(token_cache.get(self.token.key)[0].name, 'Test')
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('test1233'))
+        token_cache.shared.delete(token_cache.key_prefix + self.token.key)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_shared_tier_invalidation(self):
+        # Test that an invalidation in one process reaches the others when
+        # a shared tier is configured
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        worker = TokenCache(shared_cache='default')
+        other_worker = TokenCache(shared_cache='default')
+        worker.set(self.token.key, self.user, self.token)
+        self.assertIsNotNone(worker.get(self.token.key))
+
+        other_worker.invalidate([self.token.key])
+        self.assertIsNone(worker.get(self.token.key))
+        self.assertEqual(worker.stats()['local_size'], 0)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_last_use_recorded_once(self):
+        # Test that the cached token remembers the recorded use, so that
+        # the next requests do not go through the buffer again
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        with patch.object(tokens.last_used, 'add') as add:
+            for _ in range(3):
+                res = self.client.get(CURRENT_USER_URL)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(add.call_count, 1)
+        _, token = get_token_cache().get(self.token.key)
+        self.assertEqual(token.last_used_at, add.call_args[0][1])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
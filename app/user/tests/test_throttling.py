@@ -0,0 +1,209 @@
+import inspect
+from unittest.mock import patch
+from django.test import TestCase, Client, override_settings
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.core.management.base import BaseCommand
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from user import throttling
+
+TOKEN_URL = reverse('user:token')
+
+
+def throttle_settings(**config):
+    return override_settings(
+        LOGIN_THROTTLE=dict(settings.LOGIN_THROTTLE, **config))
+
+
+class SlidingWindowTests(TestCase):
+    # Test the sliding window counters
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+
+    def test_local_store(self):
+        # Test that counts move to the previous window, then expire
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        store = throttling.LocalWindowStore()
+        for _ in range(3):
+            store.hit('key', 60, 1000)
+        self.assertEqual(store.hit('key', 60, 1010), (0, 4))
+        self.assertEqual(store.get('key', 60, 1030), (4, 0))
+        self.assertEqual(store.hit('key', 60, 1030), (4, 1))
+        self.assertEqual(store.get('key', 60, 1200), (0, 0))
+
+        store.reset('key', 60, 1030)
+        self.assertEqual(store.get('key', 60, 1030), (0, 0))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_local_store_eviction(self):
+        # Test that the store keeps a bounded number of keys
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        store = throttling.LocalWindowStore(max_entries=2)
+        for key in ('a', 'b', 'c'):
+            store.hit(key, 60, 1000)
+
+        self.assertEqual(store.get('a', 60, 1000), (0, 0))
+        self.assertEqual(store.get('c', 60, 1000), (0, 1))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_cache_store(self):
+        # Test the store backed by a shared cache
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        store = throttling.CacheWindowStore('default')
+        store.reset('key', 60, 1000)
+        store.reset('key', 60, 1030)
+        store.hit('key', 60, 1000)
+        self.assertEqual(store.hit('key', 60, 1010), (0, 2))
+        self.assertEqual(store.hit('key', 60, 1030), (2, 1))
+        self.assertEqual(store.get('key', 60, 1030), (2, 1))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_wait_time(self):
+        # Test the time until the estimated rate is back to the limit
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        # Half of the 10 attempts of the previous window still count
+        self.assertEqual(throttling.estimate(10, 2, 30, 60), 7)
+        self.assertEqual(throttling.wait_time(10, 2, 30, 60, 7), 0)
+        self.assertEqual(throttling.wait_time(10, 2, 30, 60, 5), 12)
+        # 8 attempts in the current window decay to 4 halfway into the next
+        self.assertEqual(throttling.wait_time(0, 8, 20, 60, 4), 70)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+@throttle_settings(STORE='', EMAIL_LIMIT=2, IP_LIMIT=4)
+class LoginThrottleTests(TestCase):
+    # Test the throttle of the token endpoint
+
+    def setUp(self) -> None:
+        self.cmd = BaseCommand()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@gmail.com',
+            password='test123',
+            name='Test'
+        )
+        throttling.get_store().clear()
+
+    def test_email_locked_out(self):
+        # Test that an email is locked out before the password gets checked
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        payload = {'email': 'test@gmail.com', 'password': 'wrong'}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('core.backends.hashing.check_password') as check_password:
+            res = self.client.post(
+                TOKEN_URL, {'email': 'TEST@gmail.com', 'password': 'test123'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(res['Retry-After']), 0)
+        check_password.assert_not_called()
+        self.assertIsNotNone(throttling.lockout('test@gmail.com'))
+
+        # Other emails are still allowed from the same client
+        res = self.client.post(
+            TOKEN_URL, {'email': 'other@gmail.com', 'password': 'wrong'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # From another client, this one has used up its IP_LIMIT
+        throttling.reset('test@gmail.com')
+        res = self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'test123'},
+            REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_ip_locked_out(self):
+        # Test that a client spraying many emails gets locked out
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        for i in range(4):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'user%d@gmail.com' % i, 'password': 'wrong'})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'test123'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'test123'},
+            REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_forwarded_for(self):
+        # Test that X-Forwarded-For is only trusted behind NUM_PROXIES
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        # Without a proxy, a client cannot get a new IP_LIMIT from a header
+        for i in range(4):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'user%d@gmail.com' % i, 'password': 'wrong'},
+                HTTP_X_FORWARDED_FOR='10.0.0.%d' % i)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'test123'},
+            HTTP_X_FORWARDED_FOR='10.0.0.9')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # Behind one proxy, the address it added tells clients apart
+        with override_settings(REST_FRAMEWORK=dict(
+                settings.REST_FRAMEWORK, NUM_PROXIES=1)):
+            res = self.client.post(
+                TOKEN_URL, {'email': 'test@gmail.com', 'password': 'test123'},
+                HTTP_X_FORWARDED_FOR='127.0.0.1, 10.0.0.9')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_admin_lockout(self):
+        # Test that the admin shows and resets the lockout
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+        client = Client()
+        client.force_login(admin_user)
+        for _ in range(3):
+            self.client.post(
+                TOKEN_URL, {'email': 'test@gmail.com', 'password': 'wrong'})
+
+        res = client.get(reverse('admin:core_user_change', args=[self.user.id]))
+        self.assertContains(res, 'Locked out for')
+
+        res = client.post(reverse('admin:core_user_changelist'), {
+            'action': 'reset_login_lockout',
+            '_selected_action': [self.user.id],
+        })
+        self.assertEqual(res.status_code, 302)
+        self.assertIsNone(throttling.lockout('test@gmail.com'))
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
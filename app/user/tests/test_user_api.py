@@ -1,5 +1,8 @@
 import inspect
-from django.test import TestCase
+import json
+from unittest.mock import patch
+from django.core.cache import caches
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.management.base import BaseCommand
@@ -8,8 +11,12 @@ from django.core.management.base import BaseCommand
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.serializers import UserSerializer
+
 CREATE_USER_URL = reverse('user:create')
+BULK_CREATE_USER_URL = reverse('user:bulk-create')
 TOKEN_URL = reverse('user:token')
+EXPORT_USERS_URL = reverse('user:export')
 CURRENT_USER_URL = reverse('user:currentuser')
 
 # Helper function that can be used for different tests
@@ -62,6 +69,48 @@ class PublicUserAPITests(TestCase):
 
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
 
+    def test_user_exists_other_case(self):
+        # Test that emails differing only in case are the same account
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        create_user(email='test@gmail.com', password='test123', name='test')
+
+        res = self.client.post(CREATE_USER_URL, {
+            'email': 'Test@Gmail.com',
+            'password': 'test123',
+            'name': 'test'
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_user_exists_insert_first(self):
+        # Test that validation runs no query, the INSERT reports a taken
+        # email with the usual field error
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        create_user(email='test@gmail.com', password='test123', name='test')
+        payload = {
+            'email': 'test@gmail.com',
+            'password': 'test123',
+            'name': 'test'
+        }
+        serializer = UserSerializer(data=payload)
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid())
+
+        res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['email'][0].code, 'unique')
+        self.assertEqual(
+            str(res.data['email'][0]), 'user with this email already exists.')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
     def test_password_too_short(self):
         # Test that the password must be more than 5 characters
         self.cmd.stdout.write(
@@ -106,6 +155,23 @@ class PublicUserAPITests(TestCase):
 
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
 
+    def test_create_token_email_any_case(self):
+        # Test logging in whatever the case the email is typed in
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        create_user(email='Test@Gmail.com', password='test123', name='Test')
+        self.assertTrue(get_user_model().objects.filter(
+            email='test@gmail.com').exists())
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'TEST@gmail.com', 'password': 'test123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
     def test_create_token_invalid_credentials(self):
         # Test that token is not created if invalid credentials are given
 
@@ -224,3 +290,221 @@ class PrivateUserAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
         self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_update_email_taken(self):
+        # Test that changing the email to another user's one fails cleanly
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        create_user(email='other@gmail.com', password='test123', name='Other')
+
+        res = self.client.patch(CURRENT_USER_URL, {'email': 'Other@gmail.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.email, 'other@gmail.com')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class ProfileConditionalGetTests(TestCase):
+    # Test the ETag, Last-Modified and body cache of the profile endpoint
+
+    def setUp(self) -> None:
+        self.user = create_user(
+            email='test@gmail.com',
+            password='test1233',
+            name='Test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cmd = BaseCommand()
+
+    def test_not_modified(self):
+        # Test that a matching If-None-Match or If-Modified-Since gets a 304
+        # without the profile being serialized
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res['ETag']
+        self.assertIn('private', res['Cache-Control'])
+
+        with patch.object(UserSerializer, 'represent') as represent:
+            res = self.client.get(CURRENT_USER_URL, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(res['ETag'], etag)
+            self.assertEqual(res.content, b'')
+
+            res = self.client.get(
+                CURRENT_USER_URL, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            represent.assert_not_called()
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_etag_changes_on_update(self):
+        # Test that an edit gives a new ETag, and the old one no longer
+        # matches
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        etag = self.client.get(CURRENT_USER_URL)['ETag']
+
+        res = self.client.patch(CURRENT_USER_URL, {'name': 'New'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        res = self.client.get(CURRENT_USER_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'New')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_admin_edit_changes_etag(self):
+        # Test that saving the user in the admin moves the version on
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+        client = Client()
+        client.force_login(admin_user)
+        res = client.post(
+            reverse('admin:core_user_change', args=[self.user.id]),
+            {'email': self.user.email, 'name': 'Edited'})
+        self.assertEqual(res.status_code, 302)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_version, 2)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    @override_settings(USER_PROFILE_CACHE={'ALIAS': 'default', 'TTL': 60})
+    def test_body_cache(self):
+        # Test that the rendered body is reused until the next edit
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        caches['default'].clear()
+        first = self.client.get(CURRENT_USER_URL)
+        with patch.object(UserSerializer, 'represent') as represent:
+            res = self.client.get(CURRENT_USER_URL)
+            represent.assert_not_called()
+        self.assertEqual(res.content, first.content)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res['ETag'], first['ETag'])
+
+        self.client.patch(CURRENT_USER_URL, {'name': 'New'})
+        res = self.client.get(CURRENT_USER_URL)
+        self.assertEqual(json.loads(res.content)['name'], 'New')
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class BulkCreateUserAPITests(TestCase):
+    # Test the bulk user creation endpoint
+
+    def setUp(self) -> None:
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+        self.cmd = BaseCommand()
+
+    def test_bulk_create_requires_staff(self):
+        # Test that regular users cannot bulk create users
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.client.force_authenticate(user=create_user(
+            email='test@gmail.com', password='test123'))
+        res = self.client.post(BULK_CREATE_USER_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_bulk_create_reports_row_errors(self):
+        # Test that invalid rows are reported without aborting the batch
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        create_user(email='taken@gmail.com', password='test123')
+        payload = [
+            {'email': 'one@gmail.com', 'password': 'test123', 'name': 'One'},
+            {'email': 'two@gmail.com', 'password': 'sh', 'name': 'Two'},
+            {'email': 'taken@gmail.com', 'password': 'test123', 'name': 'T'},
+            {'email': 'three@gmail.com', 'password': 'test123', 'name': '3'},
+            {'email': 'one@gmail.com', 'password': 'test123', 'name': 'Dup'},
+        ]
+        res = self.client.post(BULK_CREATE_USER_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [row['email'] for row in res.data['created']],
+            ['one@gmail.com', 'three@gmail.com']
+        )
+        self.assertEqual(
+            [error['index'] for error in res.data['errors']], [1, 2, 4])
+        self.assertEqual(res.data['errors'][1]['errors']['email'][0],
+                         'user with this email already exists.')
+        user = get_user_model().objects.get(email='three@gmail.com')
+        self.assertTrue(user.check_password('test123'))
+        self.assertFalse(
+            get_user_model().objects.filter(email='two@gmail.com').exists())
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+
+class ExportUsersAPITests(TestCase):
+    # Test the streaming user export endpoint
+
+    def setUp(self) -> None:
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@gmail.com',
+            password='123456'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+        self.cmd = BaseCommand()
+
+    def test_export_requires_staff(self):
+        # Test that regular users cannot export users
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        self.client.force_authenticate(user=create_user(
+            email='test@gmail.com', password='test123'))
+        res = self.client.get(EXPORT_USERS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
+
+    def test_export_users_ndjson(self):
+        # Test that every user is streamed in id order
+        self.cmd.stdout.write(
+            f'--------Test {self.cmd.style.WARNING(inspect.currentframe().f_code.co_name)} begins--------')
+
+        user = create_user(email='test@gmail.com', password='test123',
+                           name='Test')
+        res = self.client.get(EXPORT_USERS_URL, {'output': 'ndjson'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = [
+            json.loads(line)
+            for line in b''.join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual(rows, [
+            {'id': self.admin_user.id, 'email': 'admin@gmail.com', 'name': ''},
+            {'id': user.id, 'email': 'test@gmail.com', 'name': 'Test'},
+        ])
+
+        self.cmd.stdout.write(self.cmd.style.SUCCESS('OK!'))
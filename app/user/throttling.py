@@ -0,0 +1,201 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework import throttling
+
+from core.cache import LRUCache
+
+# Sliding window counters for the login throttle
+# Attempts are counted in fixed windows of WINDOW seconds and the rate is
+# estimated as the current window plus the previous one weighted by how much
+# of it still overlaps the sliding window, which needs two integers per key
+# instead of one timestamp per attempt
+
+
+class LocalWindowStore:
+    # Counters kept in this process only, the least recently used keys are
+    # evicted past max_entries so that spraying many emails cannot grow it
+    # without bound
+
+    def __init__(self, max_entries=100000):
+        # key -> (window index, previous count, current count)
+        self._counters = LRUCache(max_entries=max_entries)
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, now):
+        # Count one attempt, returns the (previous, current) window counts
+        index = int(now // window)
+        with self._lock:
+            previous, current = self._shift(self._counters.get(key), index)
+            current += 1
+            self._counters.set(
+                key, (index, previous, current), ttl=2 * window)
+        return previous, current
+
+    def get(self, key, window, now):
+        return self._shift(self._counters.get(key), int(now // window))
+
+    def reset(self, key, window, now):
+        self._counters.delete(key)
+
+    def clear(self):
+        self._counters.clear()
+
+    @staticmethod
+    def _shift(entry, index):
+        if entry is None:
+            return 0, 0
+        entry_index, previous, current = entry
+        if entry_index == index:
+            return previous, current
+        if entry_index == index - 1:
+            return current, 0
+        return 0, 0
+
+
+class CacheWindowStore:
+    # Counters kept in a cache from CACHES shared by every worker, one key
+    # per window, incremented atomically by backends supporting it
+
+    key_prefix = 'loginthrottle:'
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def _keys(self, key, index):
+        return (
+            '%s%s:%d' % (self.key_prefix, key, index - 1),
+            '%s%s:%d' % (self.key_prefix, key, index),
+        )
+
+    def hit(self, key, window, now):
+        previous_key, current_key = self._keys(key, int(now // window))
+        self.cache.add(current_key, 0, 2 * window)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            current = 1
+            self.cache.set(current_key, current, 2 * window)
+        return self.cache.get(previous_key, 0), current
+
+    def get(self, key, window, now):
+        keys = self._keys(key, int(now // window))
+        values = self.cache.get_many(keys)
+        return tuple(values.get(key, 0) for key in keys)
+
+    def reset(self, key, window, now):
+        self.cache.delete_many(self._keys(key, int(now // window)))
+
+    def clear(self):
+        # Entries of a shared cache expire on their own
+        pass
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    # Store configured by LOGIN_THROTTLE['STORE'], a CACHES alias, or the
+    # per-process LocalWindowStore when empty
+    config = settings.LOGIN_THROTTLE
+    alias = config.get('STORE') or ''
+    store = _stores.get(alias)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(alias)
+            if store is None:
+                if alias:
+                    store = CacheWindowStore(alias)
+                else:
+                    store = LocalWindowStore(config.get('MAX_ENTRIES', 100000))
+                _stores[alias] = store
+    return store
+
+
+def estimate(previous, current, elapsed, window):
+    # Attempts in the sliding window ending now
+    return previous * (1 - elapsed / window) + current
+
+
+def wait_time(previous, current, elapsed, window, limit):
+    # Seconds until estimate() drops back to limit
+    if current > limit:
+        # Not before the next window, then until the current count decays
+        return (window - elapsed) + window * (1 - limit / current)
+    if estimate(previous, current, elapsed, window) <= limit:
+        return 0
+    return window * (1 - (limit - current) / previous) - elapsed
+
+
+def email_key(email):
+    return 'email:' + email.strip().lower()
+
+
+def lockout(email, now=None):
+    # (attempts, seconds left) when the email is locked out, else None
+    # With the local store this only reflects the attempts seen by this
+    # process
+    config = settings.LOGIN_THROTTLE
+    window = config['WINDOW']
+    now = time.time() if now is None else now
+    previous, current = get_store().get(email_key(email), window, now)
+    elapsed = now % window
+    attempts = estimate(previous, current, elapsed, window)
+    if attempts <= config['EMAIL_LIMIT']:
+        return None
+    return (
+        int(attempts),
+        wait_time(previous, current, elapsed, window, config['EMAIL_LIMIT']))
+
+
+def reset(email, now=None):
+    window = settings.LOGIN_THROTTLE['WINDOW']
+    now = time.time() if now is None else now
+    get_store().reset(email_key(email), window, now)
+
+
+class LoginRateThrottle(throttling.BaseThrottle):
+    # Limits token requests per email and per client IP over a sliding
+    # window of LOGIN_THROTTLE['WINDOW'] seconds
+    # Throttles run before the serializer, so rejected attempts never reach
+    # the password hasher; they are still counted, which keeps clients that
+    # keep hammering the endpoint locked out
+    # Clients are told apart by get_ident(): REMOTE_ADDR, or the address the
+    # last of REST_FRAMEWORK['NUM_PROXIES'] trusted proxies put in
+    # X-Forwarded-For
+
+    def allow_request(self, request, view):
+        config = settings.LOGIN_THROTTLE
+        self.waits = []
+        if not config.get('ENABLED', True):
+            return True
+
+        window = config['WINDOW']
+        now = time.time()
+        elapsed = now % window
+        store = get_store()
+        for key, limit in self.get_limits(request, config):
+            previous, current = store.hit(key, window, now)
+            if estimate(previous, current, elapsed, window) > limit:
+                self.waits.append(
+                    wait_time(previous, current, elapsed, window, limit))
+        return not self.waits
+
+    def get_limits(self, request, config):
+        limits = [('ip:' + self.get_ident(request), config['IP_LIMIT'])]
+        try:
+            email = request.data.get('email')
+        except AttributeError:
+            email = None
+        if isinstance(email, str) and email.strip():
+            limits.append((email_key(email), config['EMAIL_LIMIT']))
+        return limits
+
+    def wait(self):
+        return math.ceil(max(self.waits)) if self.waits else None
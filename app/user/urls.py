@@ -1,11 +1,30 @@
+from django.conf import settings
 from django.urls import path
 
-from user import views
+from user import async_views, views
 
 app_name = 'user'
 
+# Coroutine versions of the endpoints used by the hot paths, for ASGI
+api_views = async_views if settings.USER_API_ASYNC else views
+
 urlpatterns = [
-    path('create/', views.CreateUserView.as_view(), name='create'),
-    path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('currentuser/', views.ManageUserView.as_view(), name='currentuser')
+    path('create/', api_views.CreateUserView.as_view(), name='create'),
+    path(
+        'bulk-create/',
+        views.BulkCreateUserView.as_view(),
+        name='bulk-create'
+    ),
+    path('export/', views.ExportUsersView.as_view(), name='export'),
+    path('token/', api_views.CreateTokenView.as_view(), name='token'),
+    path(
+        'token/rotate/',
+        views.RotateTokenView.as_view(),
+        name='token-rotate'
+    ),
+    path(
+        'currentuser/',
+        api_views.ManageUserView.as_view(),
+        name='currentuser'
+    ),
 ]
@@ -1,8 +1,16 @@
-from rest_framework import generics, authentication, permissions
+from django.http import StreamingHttpResponse
+
+from rest_framework import generics, permissions, status, views
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core import activity, export
+from core.models import AuthToken
+from user import profile_cache
+from user.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, TokenSerializer
+from user.throttling import LoginRateThrottle
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -10,20 +18,104 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
+class BulkCreateUserView(generics.GenericAPIView):
+    # Create many users in one request, e.g. for onboarding imports
+    # Rows failing validation are returned in "errors" with their position in
+    # the payload, the valid ones are still created
+    serializer_class = UserSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        users = serializer.save()
+        errors = [
+            {'index': index, 'errors': row_errors}
+            for index, row_errors in sorted(serializer.row_errors.items())
+        ]
+        return Response(
+            {'created': serializer.data, 'errors': errors},
+            status=status.HTTP_201_CREATED if users
+            else status.HTTP_400_BAD_REQUEST
+        )
+
+
 class CreateTokenView(ObtainAuthToken):
     # Create a new auth token for user
     serializer_class = TokenSerializer
     # Define a renderer function for viewing what happened in tha backend through the browser
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Rejects brute forcing before any password gets hashed
+    throttle_classes = [LoginRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token = AuthToken.objects.get_or_rotate(user)
+        activity.record_login(user)
+        return Response({'token': token.key, 'expires_at': token.expires_at})
+
+
+class RotateTokenView(views.APIView):
+    # Replace the token used to authenticate the request with a new one
+    # The previous token keeps working for AUTH_TOKEN['ROTATION_GRACE']
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        token = AuthToken.objects.rotate(request.auth)
+        return Response({'token': token.key, 'expires_at': token.expires_at})
+
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     # Manage the authenticated users
     serializer_class = UserSerializer
 
-    authentication_classes = [authentication.TokenAuthentication]
+    # Token lookups are served from an in-process/shared cache, see
+    # user.authentication
+    authentication_classes = [CachedTokenAuthentication]
     # To check if the user gets authentication to do some changes to the database
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         # Retrieve and return the authenticated user
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        # Answered with a 304 or a cached body when possible, see
+        # user.profile_cache
+        # Read only, so the user is represented without building a serializer
+        user = self.get_object()
+        return profile_cache.respond(
+            request, user,
+            lambda: self.get_serializer_class().represent(
+                user, self.get_serializer_context()),
+            self.get_renderer_context())
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        # Validators of the new version
+        return profile_cache.set_headers(response, request, self.get_object())
+
+
+class ExportUsersView(views.APIView):
+    # Stream every user as CSV (default) or NDJSON, ?output=ndjson
+    # Rows are read with keyset pagination and written as they come, so the
+    # response does not need to fit in memory
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'csv')
+        if output not in export.FORMATS:
+            return Response(
+                {'output': ['Must be one of: %s.' % ', '.join(
+                    sorted(export.FORMATS))]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        write_lines, content_type = export.FORMATS[output]
+        response = StreamingHttpResponse(
+            write_lines(export.iter_users()), content_type=content_type)
+        response['Content-Disposition'] = (
+            'attachment; filename="users.%s"' % output)
+        return response